@@ -1,16 +1,37 @@
+import time
+_imports_started = time.perf_counter()
 import streamlit as st
 import pandas as pd
 import os
 import urllib.parse
-import yfinance as yf
 import datetime
-import plotly.graph_objects as go
-from indicators import calculate_indicators
-from strategy_chain import load_strategy_chain
-from summary_chain import load_summary_chain
+import uuid
+import threading
+import concurrent.futures
+from strategy_chain import get_strategy_chain, build_strategy_inputs
+from summary_chain import get_summary_chain
+from symbols import SYMBOL_OPTIONS, parse_symbols
+from batch_analysis import download_panel, calculate_indicators_panel, latest_signals, latest_rows
+from ohlc_cache import OHLCCache
+from llm_cache import LLMResponseCache, SQLiteResponseCache
+from llm_streaming import LLMStream
+from backtest import summarize_rules
+from intraday import TIMEFRAMES, load_ohlc_file
+from charts import build_figures, figure_cache_info
+from async_llm import AsyncLLMRunner
+from precompute_store import PrecomputeStore, format_age
+from strategy_store import StrategyHistoryStore
+from instrumentation import METRICS, start_metrics_server, process_uptime
+from pipeline import load_history, prepare
+
+# 起動時間の計測（モジュールの読み込みは初回の実行でだけかかる）
+_run_started = time.perf_counter()
+METRICS.mark_startup("app_imports", _run_started - _imports_started)
 
 # APIキー取得
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
+# 指標計算のバックエンド（pandas / numpy / numba / auto）
+INDICATOR_BACKEND = os.getenv("INDICATOR_BACKEND", "pandas")
 
 st.set_page_config(page_title="📈 AIテクニカルトレードボット", layout="wide")
 st.title("📈AIテクニカルトレードボット")
@@ -31,43 +52,187 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# --- 保存用ロジック ---
-if "strategy_history" not in st.session_state:
-    st.session_state.strategy_history = {}
-
-def save_strategy_result(name: str, strategy_text: str):
-    if name and strategy_text:
-        st.session_state.strategy_history[name] = strategy_text
-        st.success(f"✅ '{name}' として保存しました。")
+# --- 株価データのディスクキャッシュ（プロセス内で共有） ---
+@st.cache_resource
+def get_ohlc_cache() -> OHLCCache:
+    return OHLCCache(os.getenv("OHLC_CACHE_DIR", ".ohlc_cache"))
+
+# --- LLM応答キャッシュ（LLM_CACHE_DB を指定するとSQLiteにも保存） ---
+@st.cache_resource
+def get_llm_cache() -> LLMResponseCache:
+    db_path = os.getenv("LLM_CACHE_DB")
+    return LLMResponseCache(backend=SQLiteResponseCache(db_path) if db_path else None)
+
+# --- 事前計算ワーカー（precompute_worker.py）の結果。DBが無ければ使わない ---
+@st.cache_resource
+def open_precompute_store(db_path: str) -> PrecomputeStore:
+    return PrecomputeStore(db_path)
+
+def get_precompute_store():
+    # ワーカーより先に画面が起動した場合も後から使えるよう、存在確認はキャッシュしない
+    db_path = os.getenv("PRECOMPUTE_DB", "precompute.db")
+    return open_precompute_store(db_path) if os.path.exists(db_path) else None
+
+# --- 計測（キャッシュのヒット率を集計に含め、METRICS_PORT 指定時は /metrics を公開） ---
+@st.cache_resource
+def init_metrics():
+    METRICS.register_gauges("ohlc_cache", lambda: get_ohlc_cache().stats())
+    METRICS.register_gauges("llm_cache", lambda: get_llm_cache().stats())
+    METRICS.register_gauges("figure_cache", figure_cache_info)
+    port = os.getenv("METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+init_metrics()
+
+# --- LangChain の読み込みとチェーン構築は初回の分析を待たせないよう裏で済ませる ---
+@st.cache_resource
+def warm_up_chains() -> threading.Thread:
+    def run():
+        started = time.perf_counter()
+        try:
+            get_strategy_chain(api_key=OPENAI_API_KEY)
+            get_summary_chain(api_key=OPENAI_API_KEY)
+        except Exception:
+            # キー未設定などはここでは無視し、実際に使うときにエラーを表示する
+            return
+        METRICS.mark_startup("chain_warmup", time.perf_counter() - started)
+
+    thread = threading.Thread(target=run, name="chain-warmup", daemon=True)
+    thread.start()
+    return thread
+
+warm_up_chains()
+
+# --- 分析履歴（SQLite に永続化。複数レプリカで同じファイルを共有できる） ---
+HISTORY_PAGE_SIZE = 20
+
+@st.cache_resource
+def get_history_store() -> StrategyHistoryStore:
+    return StrategyHistoryStore(os.getenv("STRATEGY_HISTORY_DB", "strategy_history.db"))
+
+# 保存は自分の1件だけをこの秒数まで待つ。DB が混んでいて終わらなければ次の再実行で結果を出す
+SAVE_WAIT_SECONDS = 2.0
+
+def save_strategy_result(name: str, symbol: str, strategy_text: str) -> bool:
+    if not (name and strategy_text):
+        return False
+    future = get_history_store().save(name, symbol, strategy_text)
+    try:
+        future.result(timeout=SAVE_WAIT_SECONDS)
+    except concurrent.futures.TimeoutError:
+        st.session_state.setdefault("pending_saves", []).append((name, future))
+        st.info(f"⏳ '{name}' を保存しています。完了すると履歴に表示されます。")
+        return False
+    except Exception as e:
+        st.error(f"⚠️ '{name}' を保存できませんでした（{type(e).__name__}: {e}）")
+        return False
+    st.success(f"✅ '{name}' として保存しました。")
+    return True
+
+def report_pending_saves():
+    # 待ちきれなかった保存の結果を、終わったものから表示する
+    pending = []
+    for name, future in st.session_state.get("pending_saves", []):
+        if not future.done():
+            pending.append((name, future))
+        elif future.exception() is not None:
+            error = future.exception()
+            st.sidebar.error(f"⚠️ '{name}' を保存できませんでした（{type(error).__name__}: {error}）")
+        else:
+            st.sidebar.success(f"✅ '{name}' を保存しました。")
+    st.session_state.pending_saves = pending
 
 def select_saved_strategy():
-    if st.session_state.strategy_history:
-        selected_name = st.sidebar.selectbox("📂 保存済み分析結果", list(st.session_state.strategy_history.keys()))
-        if selected_name:
+    store = get_history_store()
+    query = st.sidebar.text_input("🔍 履歴を検索", key="history_query")
+    _, total = store.list(page_size=1, query=query)
+    if total == 0:
+        st.sidebar.info("該当する分析結果はありません。" if query else "保存された分析結果はまだありません。")
+        return
+
+    pages = -(-total // HISTORY_PAGE_SIZE)
+    # 初期値は session_state だけで与える（value= と併用すると Streamlit が警告を出す）。
+    # 検索で件数が減ったときにページ番号が範囲外にならないようにする
+    if "history_page" not in st.session_state:
+        st.session_state.history_page = 1
+    elif st.session_state.history_page > pages:
+        st.session_state.history_page = pages
+    page = st.sidebar.number_input(f"ページ（全{pages}ページ・{total}件）", min_value=1, max_value=pages, key="history_page") - 1
+    items, _ = store.list(page=page, page_size=HISTORY_PAGE_SIZE, query=query)
+    labels = {item["id"]: f"{item['name']}（{item['symbol']}）" for item in items}
+    selected_id = st.sidebar.selectbox("📂 保存済み分析結果", list(labels.keys()), format_func=labels.get)
+    if selected_id is not None:
+        entry = store.get(selected_id)
+        if entry:
             st.sidebar.markdown("⬇️ 分析結果")
-            st.sidebar.markdown(st.session_state.strategy_history[selected_name])
-    else:
-        st.sidebar.info("保存された分析結果はまだありません。")
-
-
-menu = st.sidebar.radio("メニューを選択", ["戦略チャットボット"])
+            st.sidebar.markdown(entry["strategy"])
+
+def analyze_and_stream(symbol: str, data: pd.DataFrame) -> bool:
+    # 指標を計算して戦略をストリーミング表示し、結果を session_state に保持する
+    started = time.perf_counter()
+    with st.spinner("AIがデータを分析中..."):
+        prepared = prepare(symbol, data, backend=INDICATOR_BACKEND)
+
+        if prepared["inputs"] is None:
+            st.error("⚠️ 指標計算に必要なデータが不足しています。")
+            st.session_state.pop("analysis", None)
+            return False
+
+        chain = get_strategy_chain(api_key=OPENAI_API_KEY)
+        stream = LLMStream(chain, prepared["inputs"], get_llm_cache())
+        with METRICS.timer("llm_strategy"):
+            st.chat_message("assistant").write_stream(stream)
+        METRICS.increment("llm_requests", kind="strategy", cached=stream.from_cache)
+
+        # 再実行（保存・共有ボタン）でも結果を表示できるよう保持する
+        st.session_state.analysis = {
+            "symbol": symbol,
+            "df": prepared["df"],
+            "strategy": stream.text,
+            "from_cache": stream.from_cache,
+            "summary": None,
+            "dataset_key": uuid.uuid4().hex,
+        }
+        METRICS.mark_startup("first_analysis", time.perf_counter() - started)
+        return True
+
+
+menu = st.sidebar.radio("メニューを選択", ["戦略チャットボット", "一括スクリーニング"])
 with st.sidebar:
     st.markdown("---")
     st.subheader("📁 過去の分析履歴")
+    report_pending_saves()
     select_saved_strategy()
+    cache_stats = get_ohlc_cache().stats()
+    st.caption(
+        f"💾 データキャッシュ: ヒット {cache_stats['hits']} / 部分ヒット {cache_stats['partial_hits']}"
+        f" / ミス {cache_stats['misses']}（{cache_stats['symbols']}銘柄）"
+    )
 
 if menu == "戦略チャットボット":
-    symbol_options = {
-        "S&P500（米国）": "^GSPC",
-        "日経平均（日本）": "^N225",
-        "NASDAQ100（米国）": "^NDX",
-        "USD/JPY（ドル円）": "JPY=X",
-        "EUR/USD（ユーロドル）": "EURUSD=X"
-    }
+    symbol_options = SYMBOL_OPTIONS
     symbol_label = st.selectbox("銘柄を選択（または直接入力も可能）", list(symbol_options.keys()))
     default_symbol = symbol_options[symbol_label]
     symbol = st.text_input("銘柄コード（Yahoo Finance形式）", value=default_symbol)
     use_yfinance = st.checkbox("📡 Yahoo Financeから自動取得する", value=True)
+    streamed = False
+
+    # 事前計算済みの結果があれば、取得・計算・生成を待たずに表示できる
+    precompute_store = get_precompute_store()
+    precomputed = precompute_store.get_meta(symbol) if precompute_store else None
+    if precomputed and precomputed["has_strategy"]:
+        st.info(f"⚡ {symbol} の事前計算済みの分析があります（{format_age(precomputed['age_seconds'])}前に更新・最新足 {precomputed['latest_date'][:10]}）")
+        if st.button("⚡ 事前計算済みの結果を表示", key="show_precomputed"):
+            ready = precompute_store.get(symbol)
+            st.session_state.analysis = {
+                "symbol": symbol,
+                "df": ready["df"],
+                "strategy": ready["strategy"],
+                "from_cache": False,
+                "summary": None,
+                "dataset_key": uuid.uuid4().hex,
+                "updated_at": ready["updated_at"],
+            }
 
     if use_yfinance:
         start_date = st.date_input("開始日", pd.to_datetime("2023-01-01"))
@@ -75,168 +240,212 @@ if menu == "戦略チャットボット":
 
         if st.button("📊 データ取得 & 分析する", key="analyze_yf"):
             with st.spinner("データ取得中..."):
-                data = yf.download(symbol, start=start_date, end=end_date)
+                try:
+                    data, warning = load_history(symbol, start_date, end_date, get_ohlc_cache())
+                except Exception as e:
+                    st.error(f"⚠️ データ取得に失敗しました。時間をおいて再度お試しください（{type(e).__name__}: {e}）")
+                    st.stop()
 
                 if data.empty:
                     st.error("⚠️ データが取得できませんでした。銘柄コードまたは日付範囲を見直してください。")
                     st.stop()
 
-                if isinstance(data.columns, pd.MultiIndex):
-                    data.columns = data.columns.get_level_values(0)
-
-                data = data.reset_index()
-                data.rename(columns={
-                    "Date": "日付", "Open": "始値", "High": "高値", "Low": "安値", "Close": "終値"
-                }, inplace=True)
-
-                st.success(f"✅ データ取得完了：{symbol}")
+                if warning:
+                    st.warning(f"⚠️ {warning}")
+                else:
+                    st.success(f"✅ データ取得完了：{symbol}")
                 st.dataframe(data.tail())
 
-            with st.spinner("AIがデータを分析中..."):
-                df = calculate_indicators(data)
-                clean_df = df.dropna(subset=[
-                    "RSI_14", "MACD", "MACD_Signal",
-                    "BB_Lower", "Stoch_K_14_3", "Stoch_D_14_3"
-                ])
+            streamed = analyze_and_stream(symbol, data)
 
-                if clean_df.empty:
-                    st.error("⚠️ 指標計算に必要なデータが不足しています。")
+    else:
+        uploaded_file = st.file_uploader("📄 90本以上の株価CSV / Parquetファイルをアップロード", type=["csv", "parquet"])
+        st.markdown('CSVファイルはこちらのサイトからダウンロードできます [investing.com](https://jp.investing.com/markets/)')
+        timeframe = st.selectbox("時間足（分足・ティックデータは集約して分析）", list(TIMEFRAMES.keys()), index=list(TIMEFRAMES.keys()).index("1d"))
+
+        if uploaded_file:
+            if st.button("📊 分析する", key="analyze_csv"):
+                with st.spinner("ファイルを読み込み中..."):
+                    try:
+                        with METRICS.timer("load_ohlc_file"):
+                            data = load_ohlc_file(uploaded_file, timeframe)
+                    except (KeyError, ValueError) as e:
+                        st.error(f"⚠️ ファイルを読み込めませんでした: {e}")
+                        st.stop()
+
+                if len(data) < 90:
+                    st.error("⚠️ 90本以上のデータが必要です。")
                 else:
-                    latest = clean_df.iloc[-1]
-
-                    macd_text = f"MACD: {latest['MACD']:.2f}, Signal: {latest['MACD_Signal']:.2f}"
-                    rsi_text = f"RSI14は{latest['RSI_14']:.1f}"
-                    sma_text = f"SMA5({latest['SMA_5']:.2f}) vs SMA20({latest['SMA_20']:.2f})"
-                    bb_text = f"価格({latest['終値']:.2f})はBB範囲 {latest['BB_Lower']:.2f}〜{latest['BB_Upper']:.2f}"
-                    stoch_text = f"%K: {latest['Stoch_K_14_3']:.1f}, %D: {latest['Stoch_D_14_3']:.1f}"
-
-                    chain = load_strategy_chain(api_key=OPENAI_API_KEY)
-                    strategy = chain.run({
-                        "symbol": symbol,
-                        "macd": macd_text,
-                        "rsi": rsi_text,
-                        "sma": sma_text,
-                        "bb": bb_text,
-                        "stoch": stoch_text
-                    })
-
-                    st.chat_message("assistant").markdown(strategy)
-
-                    save_name = st.text_input("分析結果に名前を付けて保存", value=f"{symbol}_{datetime.date.today()}")
-                    if st.button("保存する"):
-                        save_strategy_result(save_name, strategy)
-                        # サイドバーの履歴を即時更新
-                        st.experimental_rerun()
-
-                    st.markdown("\n\n---\n※本戦略はAIによるテクニカル分析に基づいて自動生成された参考情報であり、投資判断はご自身の責任でお願いします。本サービスは投資助言ではありません。")
-
-                    # チャート表示
-                    st.subheader("📊 テクニカルチャート")
-                    tab1, tab2, tab3 = st.tabs(["📈 ローソク足＋SMA", "📉 MACD", "💹 RSI"])
-
-                    with tab1:
-                        fig = go.Figure()
-                        fig.add_trace(go.Candlestick(
-                            x=df["日付"],
-                            open=df["始値"],
-                            high=df["高値"],
-                            low=df["安値"],
-                            close=df["終値"],
-                            name="価格"
-                        ))
-                        fig.add_trace(go.Scatter(x=df["日付"], y=df["SMA_5"], mode="lines", name="SMA 5"))
-                        fig.add_trace(go.Scatter(x=df["日付"], y=df["SMA_20"], mode="lines", name="SMA 20"))
-                        fig.update_layout(title="ローソク足＋移動平均線", xaxis_title="日付", yaxis_title="価格")
-                        st.plotly_chart(fig, use_container_width=True)
-
-                    with tab2:
-                        fig = go.Figure()
-                        fig.add_trace(go.Scatter(x=df["日付"], y=df["MACD"], mode="lines", name="MACD"))
-                        fig.add_trace(go.Scatter(x=df["日付"], y=df["MACD_Signal"], mode="lines", name="Signal", line=dict(dash="dot")))
-                        fig.update_layout(title="MACD", xaxis_title="日付", yaxis_title="値")
-                        st.plotly_chart(fig, use_container_width=True)
-
-                    with tab3:
-                        fig = go.Figure()
-                        fig.add_trace(go.Scatter(x=df["日付"], y=df["RSI_14"], mode="lines", name="RSI"))
-                        fig.add_shape(type="line", x0=df["日付"].min(), x1=df["日付"].max(), y0=70, y1=70, line=dict(color="red", dash="dash"))
-                        fig.add_shape(type="line", x0=df["日付"].min(), x1=df["日付"].max(), y0=30, y1=30, line=dict(color="green", dash="dash"))
-                        fig.update_layout(title="RSI", xaxis_title="日付", yaxis_title="RSI")
-                        st.plotly_chart(fig, use_container_width=True)
-
-                        # st.markdown("\n\n---\n※本戦略はAIによるテクニカル分析に基づいて自動生成された参考情報であり、投資判断はご自身の責任でお願いします。本サービスは投資助言ではありません。")
-
-                    # if st.button("Xで共有する", key="x_share_button_yf"):
-                    #     with st.spinner("要約を生成中..."):
-                    #     with st.spinner("要約を生成中..."):
-                    #         summary_chain = load_summary_chain(api_key=OPENAI_API_KEY)
-                    #         summary = summary_chain.run({"strategy": strategy})
-
-                    #     hashtags = "#テクニカル分析 #CFD #LazyTech"
-                    #     tweet_text = urllib.parse.quote(f"{summary}\n{hashtags}")
-                    #     tweet_url = f"https://twitter.com/intent/tweet?text={tweet_text}"
-
-                    #     st.markdown(
-                    #         f'<a href="{tweet_url}" target="_blank">'
-                    #         f'<button style="background:#1DA1F2;color:white;border:none;padding:0.5em 1em;border-radius:5px;cursor:pointer;">🕊 Xで投稿</button></a>',
-                    #         unsafe_allow_html=True
-                    #     )
-    # else:
-    #     uploaded_file = st.file_uploader("📄 90日以上の株価CSVファイルをアップロード", type=["csv"])
-    #     st.markdown('CSVファイルはこちらのサイトからダウンロードできます [investing.com](https://jp.investing.com/markets/)')  
-
-    #     if uploaded_file:
-    #         df = pd.read_csv(uploaded_file)
-    #         if len(df) < 90:
-    #             st.error("⚠️ 90日以上のデータが必要です。")
-    #         else:
-    #             if st.button("📊 分析する", key="analyze_csv"):
-    #                 with st.spinner("AIがデータを分析中..."):
-    #                     df = calculate_indicators(df)
-                        
-    #                     # dfがNoneの場合のエラーハンドリング
-    #                     if df is None:
-    #                         st.error("⚠️ 指標計算に失敗しました。データを確認してください。")
-    #                         st.stop()
-
-    #                     clean_df = df.dropna(subset=[
-    #                         "RSI_14", "MACD", "MACD_Signal",
-    #                         "BB_Lower", "Stoch_K_14_3", "Stoch_D_14_3"
-    #                     ])
-    #                     if clean_df.empty:
-    #                         st.error("⚠️ 指標計算に必要なデータが不足しています。")
-    #                     else:
-    #                         latest = clean_df.iloc[-1]
-
-    #                         macd_text = f"MACD: {latest['MACD']:.2f}, Signal: {latest['MACD_Signal']:.2f}"
-    #                         rsi_text = f"RSI14は{latest['RSI_14']:.1f}"
-    #                         sma_text = f"SMA5({latest['SMA_5']:.2f}) vs SMA20({latest['SMA_20']:.2f})"
-    #                         bb_text = f"価格({latest['終値']:.2f})はBB範囲 {latest['BB_Lower']:.2f}〜{latest['BB_Upper']:.2f}"
-    #                         stoch_text = f"%K: {latest['Stoch_K_14_3']:.1f}, %D: {latest['Stoch_D_14_3']:.1f}"
-
-    #                         chain = load_strategy_chain(api_key=OPENAI_API_KEY)
-    #                         strategy = chain.run({
-    #                             "symbol": symbol,
-    #                             "macd": macd_text,
-    #                             "rsi": rsi_text,
-    #                             "sma": sma_text,
-    #                             "bb": bb_text,
-    #                             "stoch": stoch_text
-    #                         })
-
-    #                         st.chat_message("assistant").markdown(strategy)
-    #                         st.markdown("\n\n---\n※本戦略はAIによるテクニカル分析に基づいて自動生成された参考情報であり、投資判断はご自身の責任でお願いします。本サービスは投資助言ではありません。")
-
-                            # if st.button("Xで共有する", key="x_share_button_csv"):
-                            #     with st.spinner("要約を生成中..."):
-                            #         summary_chain = load_summary_chain(api_key=OPENAI_API_KEY)
-                            #         summary = summary_chain.run({"strategy": strategy})
-
-                            #     hashtags = "#テクニカル分析 #CFD #LazyTech"
-                            #     tweet_text = urllib.parse.quote(f"{summary}\n{hashtags}")
-                            #     tweet_url = f"https://twitter.com/intent/tweet?text={tweet_text}"
-
-                            #     st.markdown(f'<a href="{tweet_url}" target="_blank"><button style="background:#1DA1F2;color:white;border:none;padding:0.5em 1em;border-radius:5px;cursor:pointer;">🕊 Xで投稿</button></a>', unsafe_allow_html=True)
+                    st.success(f"✅ 読み込み完了：{len(data)}本（{timeframe}足）")
+                    st.dataframe(data.tail())
+                    streamed = analyze_and_stream(symbol, data)
+
+    analysis = st.session_state.get("analysis")
+    if analysis:
+        df = analysis["df"]
+        strategy = analysis["strategy"]
+        if not streamed:
+            st.chat_message("assistant").markdown(strategy)
+        if analysis["from_cache"]:
+            st.caption("♻️ 同じ指標データの分析結果をキャッシュから表示しています。")
+        if analysis.get("updated_at"):
+            st.caption(f"⚡ 事前計算済みの結果です（{format_age(time.time() - analysis['updated_at'])}前に更新）")
+
+        save_name = st.text_input("分析結果に名前を付けて保存", value=f"{analysis['symbol']}_{datetime.date.today()}")
+        if st.button("保存する"):
+            # 保存できたらサイドバーの履歴を即時更新（失敗時はエラーを残すため再実行しない）
+            if save_strategy_result(save_name, analysis["symbol"], strategy):
+                st.rerun()
+
+        st.markdown("\n\n---\n※本戦略はAIによるテクニカル分析に基づいて自動生成された参考情報であり、投資判断はご自身の責任でお願いします。本サービスは投資助言ではありません。")
+
+        # チャート表示（表示期間に合わせて間引いた図をデータセットごとに使い回す）
+        st.subheader("📊 テクニカルチャート")
+        first_date, last_date = df["日付"].iloc[0].to_pydatetime(), df["日付"].iloc[-1].to_pydatetime()
+        view_start, view_end = first_date, last_date
+        if first_date < last_date:
+            view_start, view_end = st.slider("表示期間", min_value=first_date, max_value=last_date,
+                                             value=(first_date, last_date), key=f"view_{analysis['dataset_key']}")
+        with METRICS.timer("build_figures"):
+            figures = build_figures(df, analysis["dataset_key"], view_start, view_end)
+        tab1, tab2, tab3 = st.tabs(["📈 ローソク足＋SMA", "📉 MACD", "💹 RSI"])
+
+        with METRICS.timer("render_charts"):
+            with tab1:
+                st.plotly_chart(figures["price"], use_container_width=True)
+
+            with tab2:
+                st.plotly_chart(figures["macd"], use_container_width=True)
+
+            with tab3:
+                st.plotly_chart(figures["rsi"], use_container_width=True)
+
+        with st.expander("📐 シグナル検証（過去データでのバックテスト）"):
+            with METRICS.timer("backtest"):
+                bt = summarize_rules(df)
+            st.dataframe(
+                bt.rename(columns={
+                    "total_return": "累積損益", "sharpe": "シャープレシオ", "max_drawdown": "最大DD",
+                    "trades": "取引回数", "hit_rate": "勝率", "exposure": "保有率"
+                }).style.format({"累積損益": "{:.1%}", "シャープレシオ": "{:.2f}", "最大DD": "{:.1%}",
+                                 "取引回数": "{:.0f}", "勝率": "{:.1%}", "保有率": "{:.1%}"}),
+                use_container_width=True
+            )
+            st.caption("※取引コストを含まない単純な検証結果です。将来の成績を保証するものではありません。")
+
+        if st.button("Xで共有する", key="x_share_button_yf") or analysis["summary"]:
+            if analysis["summary"] is None:
+                with st.spinner("要約を生成中..."):
+                    summary_chain = get_summary_chain(api_key=OPENAI_API_KEY)
+                    summary_stream = LLMStream(summary_chain, {"strategy": strategy}, get_llm_cache(), kind="summary")
+                    with METRICS.timer("llm_summary"):
+                        st.chat_message("assistant").write_stream(summary_stream)
+                    METRICS.increment("llm_requests", kind="summary", cached=summary_stream.from_cache)
+                    analysis["summary"] = summary_stream.text
+            else:
+                st.chat_message("assistant").markdown(analysis["summary"])
+
+            hashtags = "#テクニカル分析 #CFD #LazyTech"
+            tweet_text = urllib.parse.quote(f"{analysis['summary']}\n{hashtags}")
+            tweet_url = f"https://twitter.com/intent/tweet?text={tweet_text}"
+
+            st.markdown(
+                f'<a href="{tweet_url}" target="_blank">'
+                f'<button style="background:#1DA1F2;color:white;border:none;padding:0.5em 1em;border-radius:5px;cursor:pointer;">🕊 Xで投稿</button></a>',
+                unsafe_allow_html=True
+            )
+
+elif menu == "一括スクリーニング":
+    st.subheader("🗂 ウォッチリスト一括スクリーニング")
+
+    selected_labels = st.multiselect("銘柄を選択", list(SYMBOL_OPTIONS.keys()), default=list(SYMBOL_OPTIONS.keys()))
+    extra_symbols = st.text_area("追加の銘柄コード（カンマ・改行区切り、Yahoo Finance形式）", value="")
+    symbols = parse_symbols(" ".join(SYMBOL_OPTIONS[label] for label in selected_labels) + " " + extra_symbols)
+
+    start_date = st.date_input("開始日", pd.to_datetime("2023-01-01"), key="batch_start")
+    end_date = st.date_input("終了日", pd.to_datetime(datetime.date.today()), key="batch_end")
+
+    generate_ai = st.checkbox("🤖 上位銘柄のAI戦略も並行生成する", value=False)
+    top_n = st.number_input("AI戦略を生成する銘柄数（スコア上位）", min_value=1, max_value=50, value=5, disabled=not generate_ai)
+    with_summary = st.checkbox("要約（X投稿用）も生成する", value=False, disabled=not generate_ai)
+
+    if st.button("📊 一括取得 & スクリーニング", key="analyze_batch"):
+        if not symbols:
+            st.error("⚠️ 銘柄を1つ以上指定してください。")
+            st.stop()
+
+        with st.spinner(f"{len(symbols)}銘柄のデータを一括取得中..."):
+            with METRICS.timer("download_panel", symbols=len(symbols)):
+                panel = download_panel(symbols, start_date, end_date)
+
+        if panel.empty:
+            st.error("⚠️ データが取得できませんでした。銘柄コードまたは日付範囲を見直してください。")
+            st.stop()
+
+        missing = sorted(set(symbols) - set(panel["銘柄"]))
+        if missing:
+            st.warning(f"⚠️ 取得できなかった銘柄: {', '.join(missing)}")
+
+        with st.spinner("全銘柄の指標を計算中..."):
+            with METRICS.timer("calculate_indicators_panel", rows=len(panel)):
+                indicators_panel = calculate_indicators_panel(panel)
+            table = latest_signals(indicators_panel)
+
+        st.success(f"✅ {len(table)}銘柄のスクリーニング完了")
+        st.dataframe(table, use_container_width=True)
+
+        if generate_ai and not table.empty:
+            latest = latest_rows(indicators_panel)
+            targets = list(table.index[:top_n])
+            inputs = {sym: build_strategy_inputs(sym, latest.loc[sym]) for sym in targets}
+            runner = AsyncLLMRunner(concurrency=8, cache=get_llm_cache())
+            with st.spinner(f"{len(targets)}銘柄のAI戦略を並行生成中..."):
+                with METRICS.timer("llm_batch", symbols=len(targets)):
+                    results = runner.run(
+                        inputs,
+                        get_strategy_chain(api_key=OPENAI_API_KEY, max_retries=0),
+                        get_summary_chain(api_key=OPENAI_API_KEY, max_retries=0) if with_summary else None,
+                    )
+
+            for sym in targets:
+                result = results[sym]
+                with st.expander(f"🤖 {sym} のAI戦略"):
+                    if result["error"]:
+                        st.error(f"⚠️ 生成に失敗しました: {result['error']}")
+                    else:
+                        if result["summary"]:
+                            st.info(result["summary"])
+                        st.markdown(result["strategy"])
+
+            latency = pd.DataFrame(runner.latency_summary()).T
+            st.caption("⏱ LLM呼び出しのレイテンシ（秒）")
+            st.dataframe(latency, use_container_width=True)
+        st.markdown("\n\n---\n※スコアはテクニカル指標の単純な合算であり、投資助言ではありません。")
+
+# --- 計測パネル（サイドバー末尾。今回の実行分まで含めて表示する） ---
+METRICS.observe("script_run", time.perf_counter() - _run_started)
+METRICS.mark_startup("first_render", process_uptime())
+with st.sidebar:
+    if st.checkbox("🛠 計測パネルを表示", key="show_metrics"):
+        snapshot = METRICS.snapshot()
+        if snapshot["stages"]:
+            st.caption("⏱ 処理段階ごとの所要時間（秒）")
+            st.dataframe(pd.DataFrame(snapshot["stages"]).set_index("stage").round(4), use_container_width=True)
+        tokens = [c for c in snapshot["counters"] if c["name"] == "llm_tokens"]
+        if tokens:
+            st.caption("🔤 LLMトークン使用量")
+            st.dataframe(pd.DataFrame([{**c["labels"], "tokens": int(c["value"])} for c in tokens]), use_container_width=True)
+        startup = snapshot["startup"]
+        labels = {"first_render": "初回表示", "app_imports": "モジュール読み込み",
+                  "chain_warmup": "チェーン構築（裏で実行）", "first_analysis": "初回の分析"}
+        st.caption("🚀 起動時間: " + " / ".join(
+            f"{labels.get(name, name)} {seconds:.2f}秒" for name, seconds in startup.items()
+        ))
+        gauges = snapshot["gauges"]
+        st.caption(
+            f"💾 ヒット率: 株価データ {gauges.get('ohlc_cache_hit_rate', 0):.0%}"
+            f" / LLM応答 {gauges.get('llm_cache_hit_rate', 0):.0%}"
+        )
 
 # # ===== ポジションサイズ計算 =====
 # elif menu == "ポジションサイズ計算":
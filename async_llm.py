@@ -0,0 +1,170 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+from typing import Optional
+
+from llm_cache import LLMResponseCache, chain_cache_key
+
+# 再試行しても結果が変わらないエラー（認証・リクエスト不正など）
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+
+
+class TokenBucket:
+    """1秒あたり rate 回、最大 capacity 回までのバーストを許すレート制限"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status not in NON_RETRYABLE_STATUS
+
+
+class AsyncLLMRunner:
+    """
+    複数銘柄の戦略・要約生成を並行実行する。
+
+    同時実行数の上限、トークンバケットによるレート制限、指数バックオフでの再試行、
+    1回ごとのタイムアウトをかけ、呼び出しごとのレイテンシを metrics に記録する。
+    同時実行数とレート制限はインスタンス単位なので、1つのランナーを共有すれば
+    複数の generate() 呼び出し（HTTP サーバーの同時リクエストなど）をまたいで効く。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        rate_per_sec: float = 5.0,
+        burst: int = 10,
+        retries: int = 3,
+        timeout: float = 60.0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        cache: Optional[LLMResponseCache] = None,
+        metrics_window: int = 10000,
+    ):
+        self.concurrency = concurrency
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        # 長く動かすプロセスで増え続けないよう直近 metrics_window 件だけ残す
+        self.metrics = deque(maxlen=metrics_window)
+        self._loop = None
+        self._semaphore = None
+        self._bucket = None
+
+    def _limits(self) -> tuple:
+        # Semaphore / Lock はイベントループに結びつくため、実行中のループごとに1度だけ作る
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._bucket = TokenBucket(self.rate_per_sec, self.burst)
+        return self._semaphore, self._bucket
+
+    async def call(self, chain, variables: dict, symbol: str, kind: str,
+                   semaphore: asyncio.Semaphore, bucket: TokenBucket) -> tuple:
+        # 戻り値は (テキスト, キャッシュ由来か)
+        key = chain_cache_key(chain, variables, kind) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.metrics.append({"symbol": symbol, "kind": kind, "latency_s": 0.0,
+                                     "attempts": 0, "ok": True, "from_cache": True, "error": None})
+                return cached, True
+
+        started = time.perf_counter()
+        attempts = 0
+        error = None
+        ok = False
+        try:
+            while True:
+                attempts += 1
+                try:
+                    async with semaphore:
+                        await bucket.acquire()
+                        result = await asyncio.wait_for(chain.ainvoke(variables), timeout=self.timeout)
+                    text = result[chain.output_key]
+                    if key:
+                        self.cache.set(key, text)
+                    ok = True
+                    return text, False
+                except Exception as e:
+                    error = e
+                    if attempts > self.retries or not _is_retryable(e):
+                        raise
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        finally:
+            self.metrics.append({
+                "symbol": symbol,
+                "kind": kind,
+                "latency_s": time.perf_counter() - started,
+                "attempts": attempts,
+                "ok": ok,
+                "from_cache": False,
+                "error": None if ok or error is None else f"{type(error).__name__}: {error}",
+            })
+
+    async def _generate_one(self, symbol: str, variables: dict, strategy_chain, summary_chain,
+                            semaphore: asyncio.Semaphore, bucket: TokenBucket) -> dict:
+        result = {"symbol": symbol, "strategy": None, "summary": None, "from_cache": False, "error": None}
+        try:
+            result["strategy"], result["from_cache"] = await self.call(
+                strategy_chain, variables, symbol, "strategy", semaphore, bucket)
+            if summary_chain is not None:
+                result["summary"], _ = await self.call(summary_chain, {"strategy": result["strategy"]},
+                                                       symbol, "summary", semaphore, bucket)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    async def generate(self, inputs: dict, strategy_chain, summary_chain=None) -> dict:
+        # inputs: 銘柄 → build_strategy_inputs の結果。銘柄内は戦略→要約の順、銘柄間は並行
+        semaphore, bucket = self._limits()
+        results = await asyncio.gather(*(
+            self._generate_one(symbol, variables, strategy_chain, summary_chain, semaphore, bucket)
+            for symbol, variables in inputs.items()
+        ))
+        return {r["symbol"]: r for r in results}
+
+    def run(self, inputs: dict, strategy_chain, summary_chain=None) -> dict:
+        return asyncio.run(self.generate(inputs, strategy_chain, summary_chain))
+
+    def latency_summary(self) -> dict:
+        # 種類ごとの件数・失敗数・p50/p95/最大レイテンシ（キャッシュ分は除く）
+        summary = {}
+        for kind in sorted({m["kind"] for m in self.metrics}):
+            calls = [m for m in self.metrics if m["kind"] == kind and not m["from_cache"]]
+            latencies = sorted(m["latency_s"] for m in calls)
+            summary[kind] = {
+                "calls": len(calls),
+                "cached": sum(1 for m in self.metrics if m["kind"] == kind and m["from_cache"]),
+                "failed": sum(1 for m in calls if not m["ok"]),
+                "retries": sum(max(m["attempts"] - 1, 0) for m in calls),
+                "p50_s": statistics.median(latencies) if latencies else 0.0,
+                "p95_s": latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))] if latencies else 0.0,
+                "max_s": latencies[-1] if latencies else 0.0,
+            }
+        return summary
@@ -0,0 +1,247 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+TRADING_DAYS = 252
+
+
+# --- 配列版の指標（バーごとのループなし） ---
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    # 累積和の差で移動平均を求める（窓内に NaN があれば NaN）
+    out = np.full(len(x), np.nan)
+    if len(x) < window:
+        return out
+    isnan = np.isnan(x)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(isnan, 0.0, x))))
+    cnan = np.concatenate(([0], np.cumsum(isnan)))
+    sums = csum[window:] - csum[:-window]
+    nans = cnan[window:] - cnan[:-window]
+    out[window - 1:] = np.where(nans > 0, np.nan, sums / window)
+    return out
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) < window:
+        return out
+    out[window - 1:] = sliding_window_view(x, window).std(axis=1, ddof=1)
+    return out
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) < window:
+        return out
+    out[window - 1:] = sliding_window_view(x, window).min(axis=1)
+    return out
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) < window:
+        return out
+    out[window - 1:] = sliding_window_view(x, window).max(axis=1)
+    return out
+
+
+def rsi(close: np.ndarray, window: int) -> np.ndarray:
+    # calculate_indicators と同じく先頭の差分は 0 として扱う
+    delta = np.diff(close, prepend=np.nan)
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), window)
+    loss = rolling_mean(np.where(delta < 0, -delta, 0.0), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + gain / loss)
+
+
+class _Arrays:
+    """1銘柄分の価格配列と、窓幅ごとに計算済みの指標を保持する"""
+
+    def __init__(self, close: np.ndarray, high: np.ndarray, low: np.ndarray):
+        self.close = close
+        self.high = high
+        self.low = low
+        self._cache = {}
+
+    def get(self, name: str, *args) -> np.ndarray:
+        key = (name,) + args
+        if key not in self._cache:
+            self._cache[key] = self._compute(name, *args)
+        return self._cache[key]
+
+    def _compute(self, name: str, *args) -> np.ndarray:
+        if name == "sma":
+            return rolling_mean(self.close, *args)
+        if name == "std":
+            return rolling_std(self.close, *args)
+        if name == "rsi":
+            return rsi(self.close, *args)
+        if name == "stoch_k":
+            (window,) = args
+            low = rolling_min(self.low, window)
+            high = rolling_max(self.high, window)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return 100 * (self.close - low) / (high - low)
+        if name == "stoch_d":
+            k_window, d_window = args
+            return rolling_mean(self.get("stoch_k", k_window), d_window)
+        raise KeyError(f"未知の指標です: {name}")
+
+
+def _hold(events: np.ndarray) -> np.ndarray:
+    # +1/-1/0 のイベント（それ以外は NaN）を次のイベントまで保持してポジション列にする
+    idx = np.where(np.isnan(events), 0, np.arange(len(events)))
+    np.maximum.accumulate(idx, out=idx)
+    pos = events[idx]
+    return np.nan_to_num(pos, nan=0.0)
+
+
+# --- ルール：各バー終了時点のポジション（+1 ロング / -1 ショート / 0 ノーポジ） ---
+def sma_cross(a: _Arrays, fast: int = 5, slow: int = 20) -> np.ndarray:
+    fast_ma, slow_ma = a.get("sma", fast), a.get("sma", slow)
+    return np.nan_to_num(np.sign(fast_ma - slow_ma), nan=0.0)
+
+
+def rsi_threshold(a: _Arrays, window: int = 14, lower: float = 30, upper: float = 70, exit_level: float = 50) -> np.ndarray:
+    r = a.get("rsi", window)
+    prev = np.roll(r, 1)
+    prev[0] = np.nan
+    events = np.full(len(r), np.nan)
+    crossed_exit = ((prev < exit_level) & (r >= exit_level)) | ((prev > exit_level) & (r <= exit_level))
+    events[crossed_exit] = 0.0
+    events[r < lower] = 1.0
+    events[r > upper] = -1.0
+    return _hold(events)
+
+
+def bollinger_touch(a: _Arrays, window: int = 20, k: float = 2.0) -> np.ndarray:
+    mid, std = a.get("sma", window), a.get("std", window)
+    close = a.close
+    prev_close, prev_mid = np.roll(close, 1), np.roll(mid, 1)
+    prev_mid[0] = np.nan
+    events = np.full(len(close), np.nan)
+    crossed_mid = ((prev_close < prev_mid) & (close >= mid)) | ((prev_close > prev_mid) & (close <= mid))
+    events[crossed_mid] = 0.0
+    events[close <= mid - k * std] = 1.0
+    events[close >= mid + k * std] = -1.0
+    return _hold(events)
+
+
+def stoch_cross(a: _Arrays, k_window: int = 14, d_window: int = 3, lower: float = 20, upper: float = 80) -> np.ndarray:
+    k, d = a.get("stoch_k", k_window), a.get("stoch_d", k_window, d_window)
+    prev_k, prev_d = np.roll(k, 1), np.roll(d, 1)
+    prev_k[0] = np.nan
+    events = np.full(len(k), np.nan)
+    events[(prev_k <= prev_d) & (k > d) & (k < lower)] = 1.0
+    events[(prev_k >= prev_d) & (k < d) & (k > upper)] = -1.0
+    return _hold(events)
+
+
+RULES = {
+    "sma_cross": sma_cross,
+    "rsi_threshold": rsi_threshold,
+    "bollinger_touch": bollinger_touch,
+    "stoch_cross": stoch_cross,
+}
+
+RULE_LABELS = {
+    "sma_cross": "SMA5/SMA20 クロス",
+    "rsi_threshold": "RSI 30/70 逆張り",
+    "bollinger_touch": "ボリンジャーバンド タッチ",
+    "stoch_cross": "ストキャスティクス %K/%D クロス",
+}
+
+
+def evaluate(close: np.ndarray, positions: np.ndarray, cost: float = 0.0) -> dict:
+    """バー終了時点のポジションを次のバーのリターンに掛けて成績を集計する"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.nan_to_num(close[1:] / close[:-1] - 1, nan=0.0, posinf=0.0, neginf=0.0)
+    pos = positions[:-1]
+    turnover = np.abs(np.diff(positions, prepend=0.0))[:-1]
+    strat = pos * returns - cost * turnover
+
+    equity = np.cumprod(1 + strat)
+    peak = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    drawdown = 1 - equity / peak
+
+    # トレード単位の損益：ポジションが変わるたびに新しいトレードとする
+    log_ret = np.log1p(strat)
+    starts = np.flatnonzero(np.diff(pos, prepend=0.0) != 0)
+    if len(starts):
+        trade_pnl = np.expm1(np.add.reduceat(log_ret, starts))
+        held = pos[starts] != 0
+        trade_pnl = trade_pnl[held]
+    else:
+        trade_pnl = np.empty(0)
+
+    std = strat.std()
+    return {
+        "total_return": float(equity[-1] - 1) if len(equity) else 0.0,
+        "sharpe": float(strat.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+        "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        "trades": int(len(trade_pnl)),
+        "hit_rate": float((trade_pnl > 0).mean()) if len(trade_pnl) else float("nan"),
+        "exposure": float((pos != 0).mean()) if len(pos) else 0.0,
+    }
+
+
+def _arrays_from_frame(df: pd.DataFrame) -> _Arrays:
+    return _Arrays(
+        df["終値"].to_numpy(dtype=np.float64),
+        df["高値"].to_numpy(dtype=np.float64),
+        df["安値"].to_numpy(dtype=np.float64),
+    )
+
+
+def run_backtest(df: pd.DataFrame, rule: str, cost: float = 0.0, **params) -> dict:
+    a = _arrays_from_frame(df)
+    return evaluate(a.close, RULES[rule](a, **params), cost=cost)
+
+
+def summarize_rules(df: pd.DataFrame, cost: float = 0.0) -> pd.DataFrame:
+    # 既定パラメータ（画面の指標と同じ期間）で全ルールを検証した一覧
+    a = _arrays_from_frame(df)
+    rows = {RULE_LABELS[name]: evaluate(a.close, rule(a), cost=cost) for name, rule in RULES.items()}
+    return pd.DataFrame(rows).T
+
+
+# --- パラメータグリッドの並列探索 ---
+_worker_arrays: Optional[_Arrays] = None
+
+
+def _init_worker(close, high, low):
+    global _worker_arrays
+    _worker_arrays = _Arrays(close, high, low)
+
+
+def _run_chunk(rule: str, combos: list, cost: float) -> list:
+    a = _worker_arrays
+    fn = RULES[rule]
+    return [evaluate(a.close, fn(a, **params), cost=cost) for params in combos]
+
+
+def sweep(df: pd.DataFrame, rule: str, grid: dict, cost: float = 0.0,
+          processes: Optional[int] = None, chunksize: int = 64) -> pd.DataFrame:
+    """grid の全組み合わせを検証し、total_return の降順で返す"""
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    a = _arrays_from_frame(df)
+    chunks = [combos[i:i + chunksize] for i in range(0, len(combos), chunksize)]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(chunks) == 1:
+        _init_worker(a.close, a.high, a.low)
+        results = [r for chunk in chunks for r in _run_chunk(rule, chunk, cost)]
+    else:
+        # 価格配列は各ワーカーの初期化時に1度だけ渡し、指標はワーカー内でキャッシュする
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(a.close, a.high, a.low)) as pool:
+            parts = pool.map(_run_chunk, [rule] * len(chunks), chunks, [cost] * len(chunks))
+            results = [r for part in parts for r in part]
+
+    table = pd.concat([pd.DataFrame(combos), pd.DataFrame(results)], axis=1)
+    return table.sort_values("total_return", ascending=False).reset_index(drop=True)
@@ -0,0 +1,124 @@
+import pandas as pd
+
+from indicators import SIGNAL_COLUMNS
+from ohlc_cache import COLUMN_MAP
+
+
+def download_panel(symbols: list, start, end) -> pd.DataFrame:
+    import yfinance as yf
+
+    # 全銘柄を1回の一括ダウンロードで取得（内部でスレッド並列）
+    data = yf.download(symbols, start=start, end=end, group_by="column", threads=True, progress=False)
+    if data is None or data.empty:
+        return pd.DataFrame(columns=["銘柄"] + list(COLUMN_MAP.values()))
+    return to_panel(data, symbols)
+
+
+def to_panel(data: pd.DataFrame, symbols: list) -> pd.DataFrame:
+    # yfinance のワイド形式 (項目, 銘柄) を 銘柄×日付 の縦持ちパネルに変換
+    if isinstance(data.columns, pd.MultiIndex):
+        stacked = data.stack(level=1, future_stack=True)
+    else:
+        stacked = data.copy()
+        stacked.index = pd.MultiIndex.from_arrays([stacked.index, [symbols[0]] * len(stacked)])
+
+    stacked.index = stacked.index.set_names(["Date", "銘柄"])
+    panel = stacked.reset_index().rename(columns=COLUMN_MAP).rename_axis(columns=None)
+    panel = panel.dropna(subset=["終値"])
+    panel = panel.sort_values(["銘柄", "日付"], kind="stable").reset_index(drop=True)
+    return panel[["銘柄", "日付", "始値", "高値", "安値", "終値"]]
+
+
+def calculate_indicators_panel(panel: pd.DataFrame) -> pd.DataFrame:
+    # calculate_indicators と同じ指標を、銘柄ループなしで縦持ちパネル全体に一括計算する
+    df = panel.copy()
+    df.columns = df.columns.str.strip()
+    df['日付'] = pd.to_datetime(df['日付'])
+    df = df.sort_values(['銘柄', '日付'], kind="stable").reset_index(drop=True)
+
+    for col in ['終値', '始値', '高値', '安値']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            raise KeyError(f"列 '{col}' がDataFrameに存在しません。")
+
+    keys = df['銘柄']
+
+    def rolling(series: pd.Series, window: int):
+        return series.groupby(keys, sort=False).rolling(window=window)
+
+    def by_row(result: pd.Series) -> pd.Series:
+        # groupby().rolling() が付ける銘柄レベルを外して元の行順に戻す
+        return result.reset_index(level=0, drop=True).sort_index()
+
+    close = df['終値']
+
+    # 単純移動平均
+    df['SMA_5'] = by_row(rolling(close, 5).mean())
+    df['SMA_20'] = by_row(rolling(close, 20).mean())
+
+    # RSI（14期間）
+    delta = close.groupby(keys, sort=False).diff()
+    gain = by_row(rolling(delta.where(delta > 0, 0), 14).mean())
+    loss = by_row(rolling(-delta.where(delta < 0, 0), 14).mean())
+    rs = gain / loss
+    df['RSI_14'] = 100 - (100 / (1 + rs))
+
+    # MACD
+    ema12 = by_row(close.groupby(keys, sort=False).ewm(span=12, adjust=False).mean())
+    ema26 = by_row(close.groupby(keys, sort=False).ewm(span=26, adjust=False).mean())
+    df['MACD'] = ema12 - ema26
+    df['MACD_Signal'] = by_row(df['MACD'].groupby(keys, sort=False).ewm(span=9, adjust=False).mean())
+
+    # ボリンジャーバンド
+    mid = df['SMA_20']
+    std = by_row(rolling(close, 20).std())
+    df['BB_Middle'] = mid
+    df['BB_Upper'] = mid + 2 * std
+    df['BB_Lower'] = mid - 2 * std
+
+    # ストキャスティクス（%K と %D）
+    low14 = by_row(rolling(df['安値'], 14).min())
+    high14 = by_row(rolling(df['高値'], 14).max())
+    df['Stoch_K_14_3'] = 100 * (close - low14) / (high14 - low14)
+    df['Stoch_D_14_3'] = by_row(rolling(df['Stoch_K_14_3'], 3).mean())
+
+    return df
+
+
+def latest_rows(df: pd.DataFrame) -> pd.DataFrame:
+    # 銘柄ごとに主要指標がすべて揃っている最新行（銘柄をインデックスにする）
+    clean = df.dropna(subset=SIGNAL_COLUMNS)
+    return clean.groupby('銘柄', sort=False).tail(1).set_index('銘柄')
+
+
+def latest_signals(df: pd.DataFrame) -> pd.DataFrame:
+    # 銘柄ごとの最新の有効行からシグナルを採点し、スコア順に並べる
+    latest = latest_rows(df)
+
+    close = latest['終値']
+    macd_up = latest['MACD'] > latest['MACD_Signal']
+    sma_up = latest['SMA_5'] > latest['SMA_20']
+    k, d = latest['Stoch_K_14_3'], latest['Stoch_D_14_3']
+
+    score = (
+        macd_up.astype(int) * 2 - 1
+        + sma_up.astype(int) * 2 - 1
+        + (latest['RSI_14'] < 30).astype(int) - (latest['RSI_14'] > 70).astype(int)
+        + (close < latest['BB_Lower']).astype(int) - (close > latest['BB_Upper']).astype(int)
+        + ((k > d) & (k < 20)).astype(int) - ((k < d) & (k > 80)).astype(int)
+    )
+
+    table = pd.DataFrame({
+        "日付": latest['日付'].dt.date,
+        "終値": close,
+        "RSI14": latest['RSI_14'].round(1),
+        "MACD": macd_up.map({True: "上向き", False: "下向き"}),
+        "SMA5/20": sma_up.map({True: "GC圏", False: "DC圏"}),
+        "BB位置": ((close - latest['BB_Lower']) / (latest['BB_Upper'] - latest['BB_Lower'])).round(2),
+        "%K": k.round(1),
+        "%D": d.round(1),
+        "スコア": score,
+    })
+    table["判定"] = pd.cut(table["スコア"], bins=[-10, -2, 1, 10], labels=["売り優勢", "中立", "買い優勢"])
+    return table.sort_values(["スコア", "RSI14"], ascending=[False, True])
@@ -0,0 +1,293 @@
+"""
+ホットパスのベンチマーク。
+
+合成した OHLC データで 指標計算 / 列名の整形 / 最新行の抽出 / プロンプト変数の整形 を計測し、
+結果を JSON に保存する。ネットワークと API キーは不要（LLM はダミーを使う）。
+
+    python benchmark.py --sizes 1000,10000,100000 --output bench.json
+    python benchmark.py --compare old.json --output new.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from indicator_kernels import HAVE_NUMBA, check_equivalence
+from indicators import calculate_indicators, latest_complete_row
+from ohlc_cache import normalize_yf_frame
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def synthetic_ohlc(rows: int, seed: int = 0) -> pd.DataFrame:
+    # ランダムウォークの終値から4本値を作る（calculate_indicators の入力形式）
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    spread = np.abs(rng.normal(0, 0.005, rows)) * close
+    open_ = close * (1 + rng.normal(0, 0.002, rows))
+    return pd.DataFrame({
+        "日付": pd.date_range("1990-01-01", periods=rows, freq="min"),
+        "始値": open_,
+        "高値": np.maximum(open_, close) + spread,
+        "安値": np.minimum(open_, close) - spread,
+        "終値": close,
+        "Volume": rng.integers(1_000, 10_000, rows),
+    })
+
+
+def synthetic_yf_frame(rows: int, symbol: str = "JPY=X") -> pd.DataFrame:
+    # yf.download が返す (Price, Ticker) の MultiIndex 列と Date インデックスの形
+    df = synthetic_ohlc(rows).set_index("日付")
+    df.index.name = "Date"
+    df = df.rename(columns={"始値": "Open", "高値": "High", "安値": "Low", "終値": "Close"})
+    df.columns = pd.MultiIndex.from_product([df.columns, [symbol]], names=["Price", "Ticker"])
+    return df
+
+
+def _stub_chain():
+    from llm_streaming import load_fake_llm
+    from strategy_chain import load_strategy_chain
+
+    return load_strategy_chain("stub", llm=load_fake_llm(sleep=0))
+
+
+# 名前 → (rows からの入力準備, 計測対象)。入力準備の時間は計測に含めない
+def _bench_calculate_indicators():
+    return lambda rows: (synthetic_ohlc(rows),), calculate_indicators
+
+
+def _bench_calculate_indicators_backend(backend: str):
+    def factory():
+        from functools import partial
+
+        # JIT コンパイル時間を計測に含めないよう、先に小さい入力で1回呼んでおく
+        calculate_indicators(synthetic_ohlc(100), backend=backend)
+        return lambda rows: (synthetic_ohlc(rows),), partial(calculate_indicators, backend=backend)
+
+    return factory
+
+
+def _bench_normalize():
+    # normalize_yf_frame は列を書き換えるので毎回新しいフレームを渡す
+    return lambda rows: (synthetic_yf_frame(rows),), normalize_yf_frame
+
+
+def _bench_latest_row():
+    return lambda rows: (calculate_indicators(synthetic_ohlc(rows)),), latest_complete_row
+
+
+def _bench_prompt():
+    from strategy_chain import build_strategy_inputs
+
+    chain = _stub_chain()
+
+    def run(latest):
+        return chain.prompt.format_prompt(**build_strategy_inputs("JPY=X", latest))
+
+    return lambda rows: (latest_complete_row(calculate_indicators(synthetic_ohlc(max(rows, 100)))),), run
+
+
+def _bench_stub_llm():
+    from strategy_chain import build_strategy_inputs
+
+    chain = _stub_chain()
+
+    def run(latest):
+        return chain.run(build_strategy_inputs("JPY=X", latest))
+
+    return lambda rows: (latest_complete_row(calculate_indicators(synthetic_ohlc(max(rows, 100)))),), run
+
+
+BENCHMARKS = {
+    "calculate_indicators": _bench_calculate_indicators,
+    "calculate_indicators_numpy": _bench_calculate_indicators_backend("numpy"),
+    "normalize_yf_frame": _bench_normalize,
+    "latest_complete_row": _bench_latest_row,
+    "prompt_variables": _bench_prompt,
+    "strategy_chain_stub_llm": _bench_stub_llm,
+}
+
+if HAVE_NUMBA:
+    BENCHMARKS["calculate_indicators_numba"] = _bench_calculate_indicators_backend("numba")
+
+# pandas 版と結果が一致するかも確認するベンチマーク → バックエンド名
+EQUIVALENCE_CHECKS = {"calculate_indicators_numpy": "numpy", "calculate_indicators_numba": "numba"}
+
+# 入力の大きさに依存しないベンチマーク（最小サイズでのみ計測）
+SIZE_INDEPENDENT = {"prompt_variables", "strategy_chain_stub_llm"}
+
+
+def measure(setup, fn, rows: int, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        args = setup(rows)
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    # メモリ計測はトレースの負荷が時間に混ざらないよう別に1回だけ実行する
+    args = setup(rows)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "rows": rows,
+        "repeat": repeat,
+        "best_s": best,
+        "median_s": statistics.median(times),
+        "peak_mb": peak / 1024 / 1024,
+        "rows_per_s": rows / best if best > 0 else float("inf"),
+    }
+
+
+# app.py が起動時に読み込むモジュール
+STARTUP_IMPORTS = [
+    "streamlit", "pandas", "indicators", "strategy_chain", "summary_chain", "symbols", "batch_analysis",
+    "ohlc_cache", "llm_cache", "llm_streaming", "backtest", "intraday", "charts", "async_llm",
+    "precompute_store", "strategy_store", "instrumentation", "pipeline",
+]
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+for name in {imports!r}:
+    __import__(name)
+imported = time.perf_counter()
+langchain_at_startup = "langchain" in sys.modules
+from strategy_chain import get_strategy_chain
+from summary_chain import get_summary_chain
+get_strategy_chain("stub")
+get_summary_chain("stub")
+print(json.dumps({{"imports_s": imported - started, "first_chain_s": time.perf_counter() - imported,
+                  "langchain_at_startup": langchain_at_startup}}))
+"""
+
+
+def measure_startup(repeat: int, top: int = 10) -> dict:
+    """
+    新しいプロセスで app.py と同じモジュールを読み込み、コールドスタートの時間を測る。
+
+    imports_s は画面の初回表示までに必要な import、first_chain_s は初めて LLM チェーンを
+    作るとき（LangChain の読み込みを含む）の時間。-X importtime で重いモジュールも挙げる。
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    env = {k: v for k, v in os.environ.items() if k != "FAKE_LLM"}
+    script = _STARTUP_SCRIPT.format(imports=STARTUP_IMPORTS)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=cwd, env=env)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    # import ごとの累積時間（us）。トップレベルの import だけを大きい順に並べる
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(STARTUP_IMPORTS)}"],
+                           capture_output=True, text=True, check=True, cwd=cwd, env=env).stderr
+    modules = []
+    for line in trace.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and not parts[2].startswith("  ") and parts[1].strip().isdigit():
+            modules.append({"module": parts[2].strip(), "cumulative_ms": int(parts[1]) / 1000})
+    modules.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+
+    return {
+        "repeat": repeat,
+        "imports_s": min(r["imports_s"] for r in runs),
+        "first_chain_s": min(r["first_chain_s"] for r in runs),
+        "langchain_at_startup": any(r["langchain_at_startup"] for r in runs),
+        "slowest_imports": modules[:top],
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes: list, names: list, repeat: int) -> dict:
+    results = []
+    for name in names:
+        setup, fn = BENCHMARKS[name]()
+        for rows in (sizes[:1] if name in SIZE_INDEPENDENT else sizes):
+            r = measure(setup, fn, rows, repeat)
+            r["name"] = name
+            note = ""
+            if name in EQUIVALENCE_CHECKS:
+                check = check_equivalence(synthetic_ohlc(rows), EQUIVALENCE_CHECKS[name])
+                r["equivalent"] = check["ok"]
+                r["max_abs_diff"] = max(c["max_abs_diff"] for c in check["columns"].values())
+                note = f"  一致 {'OK' if check['ok'] else 'NG'} (最大差 {r['max_abs_diff']:.1e})"
+            results.append(r)
+            print(f"{name:<28}{rows:>12,} rows  best {r['best_s'] * 1000:10.2f} ms"
+                  f"  peak {r['peak_mb']:9.1f} MB  {r['rows_per_s']:14,.0f} rows/s{note}")
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict):
+    # 同じ (name, rows) の best_s を比べて倍率を表示する（>1 は遅くなった）
+    before = {(r["name"], r["rows"]): r for r in old["results"]}
+    print(f"\n比較: {old.get('commit')} → {new.get('commit')}")
+    for r in new["results"]:
+        prev = before.get((r["name"], r["rows"]))
+        if prev:
+            ratio = r["best_s"] / prev["best_s"] if prev["best_s"] else float("inf")
+            print(f"{r['name']:<28}{r['rows']:>12,} rows  x{ratio:6.2f}  "
+                  f"({prev['best_s'] * 1000:.2f} → {r['best_s'] * 1000:.2f} ms)")
+    if "startup" in old and "startup" in new:
+        for key, label in [("imports_s", "起動時の import"), ("first_chain_s", "初回のチェーン構築")]:
+            print(f"{label:<24}{old['startup'][key] * 1000:10.0f} → {new['startup'][key] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指標計算・データ整形・プロンプト作成のベンチマーク")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="行数のカンマ区切り（例: 1000,10000,10000000）")
+    parser.add_argument("--only", default="", help="実行するベンチマーク名のカンマ区切り")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="比較対象の過去の結果 JSON")
+    parser.add_argument("--startup", action="store_true", help="起動時間（コールドスタート）も計測する")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    report = run(sizes, names, args.repeat)
+    if args.startup:
+        report["startup"] = measure_startup(args.repeat)
+        startup = report["startup"]
+        print(f"\n起動: import {startup['imports_s'] * 1000:.0f} ms / 初回のチェーン構築 {startup['first_chain_s'] * 1000:.0f} ms"
+              f"（起動時の LangChain 読み込み: {'あり' if startup['langchain_at_startup'] else 'なし'}）")
+        for m in startup["slowest_imports"]:
+            print(f"  {m['module']:<28}{m['cumulative_ms']:10.1f} ms")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を {args.output} に保存しました。")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
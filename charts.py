@@ -0,0 +1,140 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 1500
+_FIGURE_CACHE_SIZE = 32
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets で折れ線の形を保ったまま n_out 点に間引き、
+    残す点のインデックスを返す（x は昇順の数値）。
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # 次のバケットの平均点（最後は終点）
+        if i + 2 < len(edges):
+            next_end = edges[i + 2]
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_line(dates: pd.Series, values: pd.Series, n_out: int = MAX_POINTS):
+    # NaN（指標の計算開始前）を除いてから LTTB で間引く
+    mask = values.notna().to_numpy()
+    d, v = dates[mask], values[mask].to_numpy(dtype=np.float64)
+    if len(v) <= n_out:
+        return d, v
+    x = d.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    idx = lttb(x, v, n_out)
+    return d.iloc[idx], v[idx]
+
+
+def downsample_ohlc(df: pd.DataFrame, max_bars: int = MAX_POINTS) -> pd.DataFrame:
+    # 連続する足をまとめて1本にする。高値・安値は最大・最小を残すのでヒゲは失われない
+    n = len(df)
+    if n <= max_bars:
+        return df[["日付", "始値", "高値", "安値", "終値"]]
+    size = -(-n // max_bars)
+    starts = np.arange(0, n, size)
+    return pd.DataFrame({
+        "日付": df["日付"].to_numpy()[starts],
+        "始値": df["始値"].to_numpy()[starts],
+        "高値": np.fmax.reduceat(df["高値"].to_numpy(dtype=np.float64), starts),
+        "安値": np.fmin.reduceat(df["安値"].to_numpy(dtype=np.float64), starts),
+        "終値": df["終値"].to_numpy()[np.minimum(starts + size, n) - 1],
+    })
+
+
+def visible_range(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    dates = df["日付"]
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (dates >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (dates <= pd.Timestamp(end)).to_numpy()
+    return df.loc[mask].reset_index(drop=True)
+
+
+def _build(df: pd.DataFrame, max_points: int) -> dict:
+    import plotly.graph_objects as go
+
+    candles = downsample_ohlc(df, max_points)
+    price = go.Figure()
+    price.add_trace(go.Candlestick(
+        x=candles["日付"],
+        open=candles["始値"],
+        high=candles["高値"],
+        low=candles["安値"],
+        close=candles["終値"],
+        name="価格"
+    ))
+    for col, name in [("SMA_5", "SMA 5"), ("SMA_20", "SMA 20")]:
+        x, y = downsample_line(df["日付"], df[col], max_points)
+        price.add_trace(go.Scatter(x=x, y=y, mode="lines", name=name))
+    price.update_layout(title="ローソク足＋移動平均線", xaxis_title="日付", yaxis_title="価格")
+
+    macd = go.Figure()
+    x, y = downsample_line(df["日付"], df["MACD"], max_points)
+    macd.add_trace(go.Scatter(x=x, y=y, mode="lines", name="MACD"))
+    x, y = downsample_line(df["日付"], df["MACD_Signal"], max_points)
+    macd.add_trace(go.Scatter(x=x, y=y, mode="lines", name="Signal", line=dict(dash="dot")))
+    macd.update_layout(title="MACD", xaxis_title="日付", yaxis_title="値")
+
+    rsi = go.Figure()
+    x, y = downsample_line(df["日付"], df["RSI_14"], max_points)
+    rsi.add_trace(go.Scatter(x=x, y=y, mode="lines", name="RSI"))
+    rsi.add_hline(y=70, line=dict(color="red", dash="dash"))
+    rsi.add_hline(y=30, line=dict(color="green", dash="dash"))
+    rsi.update_layout(title="RSI", xaxis_title="日付", yaxis_title="RSI")
+
+    return {"price": price, "macd": macd, "rsi": rsi}
+
+
+_figure_cache = OrderedDict()
+_figure_lock = threading.Lock()
+
+
+def build_figures(df: pd.DataFrame, dataset_key: str, start=None, end=None,
+                  max_points: int = MAX_POINTS) -> dict:
+    """
+    表示期間を切り出して間引いた3つのチャートを返す。
+
+    同じデータセット・期間の図は再実行のたびに作り直さず、プロセス内で使い回す。
+    """
+    key = (dataset_key, str(start), str(end), max_points)
+    with _figure_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+
+    figures = _build(visible_range(df, start, end), max_points)
+    with _figure_lock:
+        _figure_cache[key] = figures
+        while len(_figure_cache) > _FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return figures
+
+
+def figure_cache_info() -> dict:
+    with _figure_lock:
+        return {"size": len(_figure_cache), "maxsize": _FIGURE_CACHE_SIZE}
@@ -0,0 +1,325 @@
+import math
+from collections import deque
+from typing import Optional
+
+import pandas as pd
+
+from indicators import INDICATOR_COLUMNS
+
+NAN = float("nan")
+
+
+def _div(a: float, b: float) -> float:
+    # pandas / NumPy と同じ IEEE 754 の割り算（0除算で例外を出さない）
+    if b == 0.0:
+        if a == 0.0 or math.isnan(a):
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _to_float(value) -> float:
+    # pd.to_numeric(errors="coerce") 相当：変換できない値は NaN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class _RollingMean:
+    """rolling(window).mean() を逐次計算する（Kahan 補正付きの累積和）"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.comp = 0.0
+        self.nan_count = 0
+
+    def _add(self, x: float):
+        y = x - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+    def push(self, x: float) -> float:
+        self.values.append(x)
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self._add(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self._add(-old)
+        if len(self.values) < self.window or self.nan_count:
+            return NAN
+        return self.total / self.window
+
+    def copy(self) -> "_RollingMean":
+        other = _RollingMean.__new__(_RollingMean)
+        other.window = self.window
+        other.values = self.values.copy()
+        other.total = self.total
+        other.comp = self.comp
+        other.nan_count = self.nan_count
+        return other
+
+
+class _RollingMeanStd:
+    """rolling(window) の mean と std(ddof=1) を Welford 法の追加・削除で逐次計算する"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0
+        self.nan_count = 0
+
+    def _add(self, x: float):
+        self.nobs += 1
+        delta = x - self.mean
+        self.mean += delta / self.nobs
+        self.ssqdm += ((self.nobs - 1) * delta * delta) / self.nobs
+
+    def _remove(self, x: float):
+        self.nobs -= 1
+        if self.nobs:
+            delta = x - self.mean
+            self.mean -= delta / self.nobs
+            self.ssqdm -= ((self.nobs + 1) * delta * delta) / self.nobs
+        else:
+            self.mean = 0.0
+            self.ssqdm = 0.0
+
+    def push(self, x: float):
+        self.values.append(x)
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self._add(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self._remove(old)
+        if len(self.values) < self.window or self.nan_count:
+            return NAN, NAN
+        var = max(self.ssqdm, 0.0) / (self.nobs - 1)
+        return self.mean, math.sqrt(var)
+
+    def copy(self) -> "_RollingMeanStd":
+        other = _RollingMeanStd.__new__(_RollingMeanStd)
+        other.window = self.window
+        other.values = self.values.copy()
+        other.nobs = self.nobs
+        other.mean = self.mean
+        other.ssqdm = self.ssqdm
+        other.nan_count = self.nan_count
+        return other
+
+
+class _RollingExtreme:
+    """単調デックで rolling(window).min() / max() を償却 O(1) で計算する"""
+
+    def __init__(self, window: int, mode: str):
+        self.window = window
+        self.is_max = mode == "max"
+        self.deque = deque()  # (位置, 値)
+        self.nan_positions = deque()
+        self.pos = -1
+
+    def push(self, x: float) -> float:
+        self.pos += 1
+        start = self.pos - self.window + 1
+        if math.isnan(x):
+            self.nan_positions.append(self.pos)
+        else:
+            if self.is_max:
+                while self.deque and self.deque[-1][1] <= x:
+                    self.deque.pop()
+            else:
+                while self.deque and self.deque[-1][1] >= x:
+                    self.deque.pop()
+            self.deque.append((self.pos, x))
+        while self.deque and self.deque[0][0] < start:
+            self.deque.popleft()
+        while self.nan_positions and self.nan_positions[0] < start:
+            self.nan_positions.popleft()
+        if start < 0 or self.nan_positions:
+            return NAN
+        return self.deque[0][1]
+
+    def copy(self) -> "_RollingExtreme":
+        other = _RollingExtreme.__new__(_RollingExtreme)
+        other.window = self.window
+        other.is_max = self.is_max
+        other.deque = self.deque.copy()
+        other.nan_positions = self.nan_positions.copy()
+        other.pos = self.pos
+        return other
+
+
+class _EWMMean:
+    """ewm(span, adjust=False).mean() を pandas と同じ NaN の扱いで逐次計算する"""
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1.0)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+        self.started = False
+
+    def push(self, x: float) -> float:
+        is_obs = not math.isnan(x)
+        if not self.started:
+            self.started = True
+            self.weighted = x
+            self.nobs = int(is_obs)
+        else:
+            self.nobs += is_obs
+            if not math.isnan(self.weighted):
+                self.old_wt *= 1.0 - self.alpha
+                if is_obs:
+                    if self.weighted != x:
+                        self.weighted = (self.old_wt * self.weighted + self.alpha * x) / (self.old_wt + self.alpha)
+                    self.old_wt = 1.0
+            elif is_obs:
+                self.weighted = x
+        return self.weighted if self.nobs >= 1 else NAN
+
+    def copy(self) -> "_EWMMean":
+        other = _EWMMean.__new__(_EWMMean)
+        other.__dict__.update(self.__dict__)
+        return other
+
+
+class IncrementalIndicators:
+    """
+    calculate_indicators と同じ指標を1本ごとに O(1) で更新するエンジン。
+
+    日付の昇順に update() / append() でバーを渡すと、その時点の最新行が
+    calculate_indicators の結果と一致する。最後のバーと同じ日付のバーを渡すと
+    確定前のローソク足として最新行を置き換える。
+    """
+
+    def __init__(self, max_history: Optional[int] = None):
+        self._state = self._new_state()
+        self._prev_state = None
+        self._last_date = None
+        self._last_row = None
+        self.history = deque(maxlen=max_history)
+
+    @staticmethod
+    def _new_state() -> dict:
+        return {
+            "sma5": _RollingMean(5),
+            "sma20": _RollingMeanStd(20),
+            "gain": _RollingMean(14),
+            "loss": _RollingMean(14),
+            "ema12": _EWMMean(12),
+            "ema26": _EWMMean(26),
+            "signal": _EWMMean(9),
+            "low14": _RollingExtreme(14, "min"),
+            "high14": _RollingExtreme(14, "max"),
+            "stoch_d": _RollingMean(3),
+            "prev_close": None,
+        }
+
+    @staticmethod
+    def _copy_state(state: dict) -> dict:
+        return {k: (v.copy() if hasattr(v, "copy") else v) for k, v in state.items()}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, max_history: Optional[int] = None) -> "IncrementalIndicators":
+        engine = cls(max_history=max_history)
+        engine.append(df)
+        return engine
+
+    def update(self, date, open_, high, low, close) -> dict:
+        date = pd.Timestamp(date)
+        if self._last_date is not None and date < self._last_date:
+            raise ValueError(f"日付 {date} は最新のバー {self._last_date} より前です。")
+
+        if self._last_date is not None and date == self._last_date:
+            # 同じ日付のバーは最新行の更新として扱う
+            self._state = self._copy_state(self._prev_state)
+            if self.history:
+                self.history.pop()
+        else:
+            self._prev_state = self._copy_state(self._state)
+
+        row = self._step(date, _to_float(open_), _to_float(high), _to_float(low), _to_float(close))
+        self._last_date = date
+        self._last_row = row
+        self.history.append(row)
+        return row
+
+    def _step(self, date, open_: float, high: float, low: float, close: float) -> dict:
+        s = self._state
+
+        sma5 = s["sma5"].push(close)
+        mid, std = s["sma20"].push(close)
+
+        # RSI：先頭バーの差分は NaN だが、pandas の where で 0 として扱われる
+        prev = s["prev_close"]
+        delta = NAN if prev is None else close - prev
+        s["prev_close"] = close
+        gain = s["gain"].push(delta if delta > 0 else 0.0)
+        loss = s["loss"].push(-delta if delta < 0 else 0.0)
+        rsi = 100 - _div(100, 1 + _div(gain, loss))
+
+        macd = s["ema12"].push(close) - s["ema26"].push(close)
+        signal = s["signal"].push(macd)
+
+        low14 = s["low14"].push(low)
+        high14 = s["high14"].push(high)
+        stoch_k = 100 * _div(close - low14, high14 - low14)
+        stoch_d = s["stoch_d"].push(stoch_k)
+
+        return {
+            "日付": date,
+            "始値": open_,
+            "高値": high,
+            "安値": low,
+            "終値": close,
+            "SMA_5": sma5,
+            "SMA_20": mid,
+            "RSI_14": rsi,
+            "MACD": macd,
+            "MACD_Signal": signal,
+            "BB_Middle": mid,
+            "BB_Upper": mid + 2 * std,
+            "BB_Lower": mid - 2 * std,
+            "Stoch_K_14_3": stoch_k,
+            "Stoch_D_14_3": stoch_d,
+        }
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+        df.columns = df.columns.str.strip()
+        for col in ['終値', '始値', '高値', '安値']:
+            if col not in df.columns:
+                raise KeyError(f"列 '{col}' がDataFrameに存在しません。")
+        df['日付'] = pd.to_datetime(df['日付'])
+        df = df.sort_values('日付')
+
+        rows = [
+            self.update(date, o, h, l, c)
+            for date, o, h, l, c in zip(df['日付'], df['始値'], df['高値'], df['安値'], df['終値'])
+        ]
+        return pd.DataFrame(rows, columns=list(self._empty_row()))
+
+    def _empty_row(self) -> dict:
+        return dict.fromkeys(["日付", "始値", "高値", "安値", "終値"] + INDICATOR_COLUMNS)
+
+    @property
+    def latest(self) -> Optional[dict]:
+        return self._last_row
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.history), columns=list(self._empty_row()))
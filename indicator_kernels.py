@@ -0,0 +1,451 @@
+"""
+calculate_indicators の全指標を、連続した float64 配列から一度に計算するカーネル。
+
+- numba: 1本のループで全指標を同時に更新する（numba が入っていれば JIT コンパイル）
+- numpy: numba が無い環境向け。窓ごとの配列演算と、ブロック単位の閉形式 EWM で計算する
+
+どちらも pandas 版と同じ NaN の扱い（窓内に NaN があれば NaN、EWM は NaN を飛ばして
+前の値を保持）で、結果は事前に確保した (列数, 行数) のバッファに書き込む。
+
+    pip install numba   # 任意。無ければ backend="auto" は numpy になる
+"""
+from typing import Optional
+
+import numpy as np
+
+from indicators import INDICATOR_COLUMNS
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+BACKENDS = ("numba", "numpy")
+
+(_SMA5, _SMA20, _RSI, _MACD, _SIGNAL,
+ _BB_MID, _BB_UP, _BB_LOW, _STOCH_K, _STOCH_D) = range(len(INDICATOR_COLUMNS))
+
+_ALPHA12 = 2.0 / 13.0
+_ALPHA26 = 2.0 / 27.0
+_ALPHA9 = 2.0 / 10.0
+# 閉形式 EWM の1ブロックの長さ（減衰係数の累積積がアンダーフローしない範囲）
+_EWM_BLOCK = 1024
+
+
+def _jit(fn):
+    if numba is None:
+        return fn
+    return numba.njit(cache=True, nogil=True, error_model="numpy")(fn)
+
+
+# --- numba 版：pandas の移動窓と同じ逐次更新（加算は Kahan 補正つき） ---
+# 平均の状態: [合計, 補正, 件数, 負の値の件数, 同じ値が続いた件数, 直前の値]
+@_jit
+def _add_mean(s, val):
+    if val == val:
+        s[2] += 1
+        y = val - s[1]
+        t = s[0] + y
+        s[1] = t - s[0] - y
+        s[0] = t
+        if np.signbit(val):
+            s[3] += 1
+        if val == s[5]:
+            s[4] += 1
+        else:
+            s[4] = 1
+        s[5] = val
+
+
+@_jit
+def _remove_mean(s, val):
+    if val == val:
+        s[2] -= 1
+        y = -val - s[1]
+        t = s[0] + y
+        s[1] = t - s[0] - y
+        s[0] = t
+        if np.signbit(val):
+            s[3] -= 1
+
+
+@_jit
+def _mean(s, window):
+    nobs = s[2]
+    if nobs < window:
+        return np.nan
+    if s[4] >= nobs:
+        return s[5]
+    result = s[0] / nobs
+    if s[3] == 0 and result < 0:
+        return 0.0
+    if s[3] == nobs and result > 0:
+        return 0.0
+    return result
+
+
+# 分散の状態: [平均, 偏差平方和, 補正, 件数, 同じ値が続いた件数, 直前の値]
+@_jit
+def _add_var(s, val):
+    if val != val:
+        return
+    if val == s[5]:
+        s[4] += 1
+    else:
+        s[4] = 1
+    s[5] = val
+    s[3] += 1
+    prev_mean = s[0] - s[2]
+    y = val - s[2]
+    t = y - s[0]
+    s[2] = t + s[0] - y
+    s[0] += t / s[3]
+    s[1] += (val - prev_mean) * (val - s[0])
+
+
+@_jit
+def _remove_var(s, val):
+    if val != val:
+        return
+    s[3] -= 1
+    if s[3] > 0:
+        prev_mean = s[0] - s[2]
+        y = val - s[2]
+        t = y - s[0]
+        s[2] = t + s[0] - y
+        s[0] -= t / s[3]
+        s[1] -= (val - prev_mean) * (val - s[0])
+    else:
+        s[0] = 0.0
+        s[1] = 0.0
+
+
+@_jit
+def _std(s, window):
+    # ddof=1
+    nobs = s[3]
+    if nobs < window or nobs < 2:
+        return np.nan
+    if s[4] >= nobs:
+        return 0.0
+    var = s[1] / (nobs - 1)
+    return np.sqrt(var) if var > 0 else 0.0
+
+
+# EWM の状態: [加重平均, 直前の重み, 件数, 開始済みか]（adjust=False, ignore_na=False）
+@_jit
+def _ewm_push(s, x, alpha):
+    is_obs = x == x
+    if s[3] == 0:
+        s[3] = 1
+        s[0] = x
+        s[2] = 1.0 if is_obs else 0.0
+    else:
+        if is_obs:
+            s[2] += 1
+        if s[0] == s[0]:
+            s[1] *= 1.0 - alpha
+            if is_obs:
+                if s[0] != x:
+                    s[0] = (s[1] * s[0] + alpha * x) / (s[1] + alpha)
+                s[1] = 1.0
+        elif is_obs:
+            s[0] = x
+    return s[0] if s[2] >= 1 else np.nan
+
+
+@_jit
+def _new_state():
+    s = np.zeros(6)
+    s[5] = np.nan
+    return s
+
+
+@_jit
+def _gain_loss(close, j):
+    # calculate_indicators と同じく、差分が無い（先頭・NaN）ところは 0 として扱う
+    if j == 0:
+        return 0.0, -0.0
+    delta = close[j] - close[j - 1]
+    gain = delta if delta > 0 else 0.0
+    loss = -delta if delta < 0 else -0.0
+    return gain, loss
+
+
+@_jit
+def _fused_loop(close, high, low, out):
+    n = close.shape[0]
+    sma5, sma20, var20 = _new_state(), _new_state(), _new_state()
+    gain14, loss14, stoch_d = _new_state(), _new_state(), _new_state()
+    ema12, ema26, ema9 = np.zeros(4), np.zeros(4), np.zeros(4)
+    ema12[1] = 1.0
+    ema26[1] = 1.0
+    ema9[1] = 1.0
+
+    for i in range(n):
+        c = close[i]
+        gain, loss = _gain_loss(close, i)
+        if i >= 5:
+            _remove_mean(sma5, close[i - 5])
+        if i >= 20:
+            _remove_mean(sma20, close[i - 20])
+            _remove_var(var20, close[i - 20])
+        if i >= 14:
+            old_gain, old_loss = _gain_loss(close, i - 14)
+            _remove_mean(gain14, old_gain)
+            _remove_mean(loss14, old_loss)
+        _add_mean(sma5, c)
+        _add_mean(sma20, c)
+        _add_var(var20, c)
+        _add_mean(gain14, gain)
+        _add_mean(loss14, loss)
+
+        out[_SMA5, i] = _mean(sma5, 5)
+        mid = _mean(sma20, 20)
+        std = _std(var20, 20)
+        out[_SMA20, i] = mid
+        out[_BB_MID, i] = mid
+        out[_BB_UP, i] = mid + 2 * std
+        out[_BB_LOW, i] = mid - 2 * std
+        out[_RSI, i] = 100 - 100 / (1 + _mean(gain14, 14) / _mean(loss14, 14))
+
+        macd = _ewm_push(ema12, c, _ALPHA12) - _ewm_push(ema26, c, _ALPHA26)
+        out[_MACD, i] = macd
+        out[_SIGNAL, i] = _ewm_push(ema9, macd, _ALPHA9)
+
+        k = np.nan
+        if i >= 13:
+            lo = np.inf
+            hi = -np.inf
+            for j in range(i - 13, i + 1):
+                if low[j] != low[j] or high[j] != high[j]:
+                    lo = np.nan
+                    break
+                lo = min(lo, low[j])
+                hi = max(hi, high[j])
+            if lo == lo:
+                k = 100 * (c - lo) / (hi - lo)
+        out[_STOCH_K, i] = k
+        if i >= 3:
+            _remove_mean(stoch_d, out[_STOCH_K, i - 3])
+        _add_mean(stoch_d, k)
+        out[_STOCH_D, i] = _mean(stoch_d, 3)
+
+
+# --- numpy 版 ---
+# 窓の各位置を1本ずつずらして出力バッファに畳み込む（窓幅 × 行数の一時配列を作らない）。
+# 行を _CHUNK 本ずつに区切り、窓幅ぶんの往復をキャッシュに載ったまま済ませる
+_CHUNK = 16384
+
+
+def _rolling_reduce_into(x: np.ndarray, window: int, out: np.ndarray, op):
+    out[:window - 1] = np.nan
+    m = len(x) - window + 1
+    for a in range(0, max(m, 0), _CHUNK):
+        b = min(a + _CHUNK, m)
+        dst = out[window - 1 + a:window - 1 + b]
+        dst[:] = x[a:b]
+        for j in range(1, window):
+            # np.add / np.minimum / np.maximum は NaN を伝播するので、窓内に NaN があれば NaN
+            op(dst, x[a + j:b + j], out=dst)
+
+
+def _rolling_mean_into(x: np.ndarray, window: int, out: np.ndarray):
+    _rolling_reduce_into(x, window, out, np.add)
+    out[window - 1:] /= window
+
+
+def _rolling_std_into(x: np.ndarray, mean: np.ndarray, window: int, out: np.ndarray, tmp: np.ndarray):
+    # 窓平均からの偏差の2乗和（ddof=1）。mean は _rolling_mean_into の結果
+    out[:window - 1] = np.nan
+    m = len(x) - window + 1
+    for a in range(0, max(m, 0), _CHUNK):
+        b = min(a + _CHUNK, m)
+        dst, mu, dev = out[window - 1 + a:window - 1 + b], mean[window - 1 + a:window - 1 + b], tmp[:b - a]
+        dst[:] = 0.0
+        for j in range(window):
+            np.subtract(x[a + j:b + j], mu, out=dev)
+            dev *= dev
+            dst += dev
+    dst = out[window - 1:]
+    dst /= window - 1
+    np.sqrt(dst, out=dst)
+
+
+def _ewm_into(x: np.ndarray, alpha: float, out: np.ndarray):
+    """
+    ewm(adjust=False).mean() を y_t = c_t * y_{t-1} + d_t * x_t の閉形式で計算する。
+
+    NaN の位置では c=1, d=0（前の値を保持）、NaN の後の観測では空白分だけ減衰させた重みを使う。
+    係数の累積積がアンダーフローしないよう _EWM_BLOCK ごとに区切り、境界で値を引き継ぐ。
+    """
+    valid = ~np.isnan(x)
+    if not valid.any():
+        out[:] = np.nan
+        return
+    first = int(np.argmax(valid))
+    out[:first] = np.nan
+    out[first] = x[first]
+    if valid[first:].all():
+        _ewm_dense(x[first + 1:], alpha, x[first], out[first + 1:])
+        return
+
+    obs = np.flatnonzero(valid[first:])
+    c = np.ones(len(x) - first)
+    d = np.zeros(len(x) - first)
+    old_wt = (1.0 - alpha) ** np.diff(obs)
+    c[obs[1:]] = old_wt / (old_wt + alpha)
+    d[obs[1:]] = alpha / (old_wt + alpha)
+    e = d * np.where(valid[first:], x[first:], 0.0)
+
+    y = out[first]
+    for start in range(1, len(c), _EWM_BLOCK):
+        stop = min(start + _EWM_BLOCK, len(c))
+        prod = np.cumprod(c[start:stop])
+        block = out[first + start:first + stop]
+        np.cumsum(e[start:stop] / prod, out=block)
+        block += y
+        block *= prod
+        y = block[-1]
+
+
+def _ewm_dense(x: np.ndarray, alpha: float, y0: float, out: np.ndarray):
+    # NaN が無い場合は係数が一定なので、全ブロックを (ブロック数, _EWM_BLOCK) の行列で一度に計算する
+    n = len(x)
+    if n == 0:
+        return
+    size = min(_EWM_BLOCK, n)
+    decay = (1.0 - alpha) ** np.arange(1, size + 1)
+    scale = alpha / decay
+    full = n - n % size
+    blocks = [x[:full].reshape(-1, size)] if full else []
+    if full < n:
+        tail = np.zeros((1, size))
+        tail[0, :n - full] = x[full:]
+        blocks.append(tail)
+    local = np.vstack(blocks) if len(blocks) > 1 else blocks[0] * 1.0
+    local *= scale
+    np.cumsum(local, axis=1, out=local)
+    local *= decay
+    # ブロック先頭の値（直前のブロック末尾）だけを逐次に引き継ぐ
+    carry = np.empty(len(local))
+    y = y0
+    last = local[:, -1]
+    for i in range(len(local)):
+        carry[i] = y
+        y = last[i] + y * decay[-1]
+    local += carry[:, None] * decay
+    out[:] = local.reshape(-1)[:n]
+
+
+def _numpy_kernel(close: np.ndarray, high: np.ndarray, low: np.ndarray, out: np.ndarray):
+    n = len(close)
+    if n == 0:
+        return
+    scratch = np.empty((4, n))
+
+    _rolling_mean_into(close, 5, out[_SMA5])
+    _rolling_mean_into(close, 20, out[_SMA20])
+    out[_BB_MID] = out[_SMA20]
+    std = scratch[0]
+    _rolling_std_into(close, out[_SMA20], 20, std, scratch[1])
+    std *= 2
+    np.add(out[_BB_MID], std, out=out[_BB_UP])
+    np.subtract(out[_BB_MID], std, out=out[_BB_LOW])
+
+    # RSI（差分が無い先頭と NaN は 0 として扱う）
+    delta = scratch[0]
+    delta[0] = np.nan
+    np.subtract(close[1:], close[:-1], out=delta[1:])
+    gain, loss = scratch[1], scratch[2]
+    np.fmin(delta, 0.0, out=loss)
+    np.negative(loss, out=loss)
+    np.fmax(delta, 0.0, out=gain)
+    rsi = out[_RSI]
+    _rolling_mean_into(gain, 14, rsi)
+    _rolling_mean_into(loss, 14, scratch[3])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi /= scratch[3]
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+
+    _ewm_into(close, _ALPHA12, scratch[0])
+    _ewm_into(close, _ALPHA26, scratch[1])
+    np.subtract(scratch[0], scratch[1], out=out[_MACD])
+    _ewm_into(out[_MACD], _ALPHA9, out[_SIGNAL])
+
+    lo, hi = scratch[0], scratch[1]
+    _rolling_reduce_into(low, 14, lo, np.minimum)
+    _rolling_reduce_into(high, 14, hi, np.maximum)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = out[_STOCH_K]
+        np.subtract(close, lo, out=k)
+        hi -= lo
+        k /= hi
+        k *= 100
+    _rolling_mean_into(k, 3, out[_STOCH_D])
+
+
+def resolve_backend(backend: str = "auto") -> str:
+    if backend == "auto":
+        return "numba" if HAVE_NUMBA else "numpy"
+    if backend not in BACKENDS:
+        raise ValueError(f"未知のバックエンドです: {backend}（{', '.join(BACKENDS)} / auto）")
+    if backend == "numba" and not HAVE_NUMBA:
+        raise ImportError("backend='numba' には numba のインストールが必要です。")
+    return backend
+
+
+def compute_indicators(close, high, low, backend: str = "auto", out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    終値・高値・安値から INDICATOR_COLUMNS の順に並んだ (列数, 行数) の配列を返す。
+
+    out に同じ形の float64 配列を渡すと、そこに書き込んで使い回す。
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    shape = (len(INDICATOR_COLUMNS), len(close))
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape or out.dtype != np.float64:
+        raise ValueError(f"out は {shape} の float64 配列である必要があります。")
+
+    if resolve_backend(backend) == "numba":
+        _fused_loop(close, high, low, out)
+    else:
+        _numpy_kernel(close, high, low, out)
+    return out
+
+
+def check_equivalence(df, backend: str = "auto", rtol: float = 1e-9, atol: float = 1e-9) -> dict:
+    """
+    pandas 版とカーネル版の結果を列ごとに比べる。
+
+    NaN の位置が一致し、値の差が |a - b| <= atol * 価格の大きさ + rtol * |b| に収まれば ok。
+    """
+    from indicators import calculate_indicators
+
+    expected = calculate_indicators(df)
+    actual = calculate_indicators(df, backend=backend)
+    scale = max(float(np.nanmax(np.abs(expected["終値"].to_numpy(dtype=np.float64)), initial=0.0)), 1.0)
+
+    columns = {}
+    for col in INDICATOR_COLUMNS:
+        a = actual[col].to_numpy(dtype=np.float64)
+        b = expected[col].to_numpy(dtype=np.float64)
+        nan_a, nan_b = np.isnan(a), np.isnan(b)
+        both = ~nan_a & ~nan_b
+        with np.errstate(invalid="ignore"):
+            diff = np.abs(a[both] - b[both])
+            # inf 同士は同じ符号なら一致とみなす
+            diff[a[both] == b[both]] = 0.0
+            within = diff <= atol * scale + rtol * np.abs(b[both])
+        columns[col] = {
+            "nan_mismatch": int((nan_a != nan_b).sum()),
+            "max_abs_diff": float(diff.max()) if diff.size else 0.0,
+            "ok": bool((nan_a == nan_b).all() and within.all()),
+        }
+    return {"backend": resolve_backend(backend), "ok": all(c["ok"] for c in columns.values()), "columns": columns}
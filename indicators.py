@@ -1,6 +1,18 @@
 import pandas as pd
 
-def calculate_indicators(df: pd.DataFrame) -> pd.DataFrame:
+# calculate_indicators が追加する列（この順番）。増分計算・数値カーネル・分足もこの定義を使う
+INDICATOR_COLUMNS = [
+    "SMA_5", "SMA_20", "RSI_14", "MACD", "MACD_Signal",
+    "BB_Middle", "BB_Upper", "BB_Lower", "Stoch_K_14_3", "Stoch_D_14_3",
+]
+
+
+def calculate_indicators(df: pd.DataFrame, backend: str = "pandas") -> pd.DataFrame:
+    """
+    テクニカル指標の列を追加したフレームを返す。
+
+    backend を "numba" / "numpy" / "auto" にすると indicator_kernels の一括計算を使う（列と値は同じ）。
+    """
     df = df.copy()
 
     # 列名の前後スペースを除去（念のため）
@@ -17,6 +29,13 @@ def calculate_indicators(df: pd.DataFrame) -> pd.DataFrame:
         else:
             raise KeyError(f"列 '{col}' がDataFrameに存在しません。")
 
+    if backend != "pandas":
+        from indicator_kernels import compute_indicators
+
+        values = compute_indicators(df['終値'].to_numpy(), df['高値'].to_numpy(), df['安値'].to_numpy(), backend=backend)
+        df[INDICATOR_COLUMNS] = values.T
+        return df
+
     # 単純移動平均
     df['SMA_5'] = df['終値'].rolling(window=5).mean()
     df['SMA_20'] = df['終値'].rolling(window=20).mean()
@@ -48,3 +67,17 @@ def calculate_indicators(df: pd.DataFrame) -> pd.DataFrame:
     df['Stoch_D_14_3'] = df['Stoch_K_14_3'].rolling(window=3).mean()
 
     return df
+
+
+SIGNAL_COLUMNS = [
+    "RSI_14", "MACD", "MACD_Signal",
+    "BB_Lower", "Stoch_K_14_3", "Stoch_D_14_3"
+]
+
+
+def latest_complete_row(df: pd.DataFrame):
+    # 主要指標がすべて揃っている最新行（無ければ None）
+    clean_df = df.dropna(subset=SIGNAL_COLUMNS)
+    if clean_df.empty:
+        return None
+    return clean_df.iloc[-1]
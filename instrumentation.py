@@ -0,0 +1,288 @@
+"""
+処理段階ごとの所要時間・カウンタ・LLMトークン使用量・キャッシュヒット率の計測。
+
+    with METRICS.timer("calculate_indicators"):
+        df = calculate_indicators(data)
+
+集計は METRICS.snapshot() で辞書として、METRICS.to_prometheus() で Prometheus の
+テキスト形式として取り出せる。METRICS_LOG を指定すると計測1件ごとに JSONL を追記し、
+start_metrics_server(port) で /metrics を HTTP 公開する。
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+PROMETHEUS_PREFIX = "tradebot"
+_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _quantile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def _labels_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metrics:
+    """
+    プロセス内で共有する計測値の入れ物（スレッドセーフ）。
+
+    段階ごとの所要時間は直近 window 件を保持して p50/p95 を出す。件数と合計は全期間。
+    """
+
+    def __init__(self, window: int = 1000, log_path: Optional[str] = None):
+        self.window = window
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=self.window))
+        self._stage_totals = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(float)
+        self._gauge_sources = {}
+        self._startup = {}
+        self._log_file = None
+
+    # --- 記録 ---
+    def observe(self, stage: str, seconds: float, **fields):
+        with self._lock:
+            self._durations[stage].append(seconds)
+            totals = self._stage_totals[stage]
+            totals[0] += 1
+            totals[1] += seconds
+        self._log({"type": "stage", "stage": stage, "seconds": round(seconds, 6), **fields})
+
+    @contextmanager
+    def timer(self, stage: str, **fields):
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.observe(stage, time.perf_counter() - started, ok=ok, **fields)
+            if not ok:
+                self.increment("stage_errors", stage=stage)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def record_tokens(self, kind: str, model: str, prompt_tokens: int, completion_tokens: int, source: str):
+        # source: "reported"（API の usage）または "estimated"（ストリーミング等で usage が無い場合の推定）
+        self.increment("llm_calls", kind=kind, model=model)
+        self.increment("llm_tokens", prompt_tokens, kind=kind, model=model, type="prompt", source=source)
+        self.increment("llm_tokens", completion_tokens, kind=kind, model=model, type="completion", source=source)
+        self._log({"type": "llm_tokens", "kind": kind, "model": model, "prompt_tokens": prompt_tokens,
+                   "completion_tokens": completion_tokens, "source": source})
+
+    def mark_startup(self, name: str, seconds: float):
+        """起動にかかった時間を記録する（プロセス内で最初の1回だけ残す）"""
+        with self._lock:
+            if name in self._startup:
+                return
+            self._startup[name] = seconds
+        self._log({"type": "startup", "name": name, "seconds": round(seconds, 6)})
+
+    def startup(self) -> dict:
+        with self._lock:
+            return dict(self._startup)
+
+    def register_gauges(self, name: str, source: Callable[[], dict]):
+        """name_<key> の値を集計時に source() から読む（キャッシュの stats() など）"""
+        with self._lock:
+            self._gauge_sources[name] = source
+
+    def _log(self, record: dict):
+        if not self.log_path:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), **record}, ensure_ascii=False)
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+            self._log_file.write(line + "\n")
+
+    # --- 集計 ---
+    def _stage_items(self) -> list:
+        with self._lock:
+            items = [(stage, sorted(values), tuple(self._stage_totals[stage])) for stage, values in self._durations.items()]
+        return sorted(items)
+
+    def stage_summary(self) -> list:
+        return [
+            {
+                "stage": stage,
+                "count": count,
+                "total_s": total,
+                "p50_s": statistics.median(values) if values else 0.0,
+                "p95_s": _quantile(values, 0.95),
+                "max_s": values[-1] if values else 0.0,
+            }
+            for stage, values, (count, total) in self._stage_items()
+        ]
+
+    def gauges(self) -> dict:
+        with self._lock:
+            sources = dict(self._gauge_sources)
+        values = {}
+        for name, source in sources.items():
+            try:
+                stats = source()
+            except Exception:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[f"{name}_{key}"] = value
+        for name, seconds in self.startup().items():
+            values[f"startup_{name}_seconds"] = seconds
+        return values
+
+    def counters(self) -> list:
+        with self._lock:
+            return [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())]
+
+    def snapshot(self) -> dict:
+        return {"stages": self.stage_summary(), "counters": self.counters(), "gauges": self.gauges(),
+                "startup": self.startup()}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        stage_metric = f"{PROMETHEUS_PREFIX}_stage_seconds"
+        lines += [f"# HELP {stage_metric} 処理段階ごとの所要時間", f"# TYPE {stage_metric} summary"]
+        for stage, values, (count, total) in self._stage_items():
+            for q in _QUANTILES:
+                lines.append(f"{stage_metric}{_labels_text((('stage', stage), ('quantile', q)))} {_quantile(values, q)}")
+            lines.append(f"{stage_metric}_count{_labels_text((('stage', stage),))} {count}")
+            lines.append(f"{stage_metric}_sum{_labels_text((('stage', stage),))} {total}")
+
+        declared = set()
+        for counter in self.counters():
+            metric = f"{PROMETHEUS_PREFIX}_{counter['name']}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_labels_text(tuple(sorted(counter['labels'].items())))} {counter['value']}")
+
+        for name, value in sorted(self.gauges().items()):
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics(log_path=os.getenv("METRICS_LOG"))
+_imported_at = time.monotonic()
+
+
+def process_uptime() -> float:
+    """プロセス起動からの経過秒（/proc が無い環境ではこのモジュールの読み込みからの秒数）"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _imported_at
+
+
+def start_metrics_server(port: int, metrics: Metrics = METRICS, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """/metrics を Prometheus 形式、/metrics.json を JSON で返すサーバーを別スレッドで起動する"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def estimate_tokens(text: str) -> int:
+    # usage が返らないとき用の概算（英数字はおよそ4文字、日本語はおよそ1文字で1トークン）
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return -(-ascii_chars // 4) + (len(text) - ascii_chars)
+
+
+def _model_name(callback_kwargs: dict) -> str:
+    params = callback_kwargs.get("invocation_params") or {}
+    return params.get("model_name") or params.get("model") or params.get("_type") or "unknown"
+
+
+_token_callback_class = None
+
+
+def token_usage_callback(kind: str, metrics: Metrics = METRICS):
+    """
+    LLM 呼び出しごとのトークン使用量を metrics に記録する LangChain コールバックを返す。
+
+    API が usage を返さない場合（ストリーミングやダミーLLM）はプロンプトと出力から推定する。
+    """
+    global _token_callback_class
+    if _token_callback_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class TokenUsageCallback(BaseCallbackHandler):
+            def __init__(self, kind: str, metrics: Metrics):
+                self.kind = kind
+                self.metrics = metrics
+                self._prompts = {}
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self._prompts[run_id] = ("".join(str(m.content) for batch in messages for m in batch),
+                                         _model_name(kwargs))
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._prompts[run_id] = ("".join(prompts), _model_name(kwargs))
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                self._prompts.pop(run_id, None)
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                prompt, model = self._prompts.pop(run_id, ("", "unknown"))
+                output = response.llm_output or {}
+                model = output.get("model_name") or model
+                usage = output.get("token_usage")
+                if not usage:
+                    message = getattr(response.generations[0][0], "message", None) if response.generations else None
+                    meta = getattr(message, "usage_metadata", None)
+                    if meta:
+                        usage = {"prompt_tokens": meta["input_tokens"], "completion_tokens": meta["output_tokens"]}
+                if usage:
+                    self.metrics.record_tokens(self.kind, model, usage.get("prompt_tokens", 0),
+                                               usage.get("completion_tokens", 0), "reported")
+                    return
+                text = "".join(g.text for gens in response.generations for g in gens)
+                self.metrics.record_tokens(self.kind, model, estimate_tokens(prompt), estimate_tokens(text), "estimated")
+
+        _token_callback_class = TokenUsageCallback
+    return _token_callback_class(kind, metrics)
@@ -0,0 +1,268 @@
+import itertools
+import os
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+# 画面で選べる時間足と pandas の resample ルール
+TIMEFRAMES = {
+    "1m": "1min",
+    "5m": "5min",
+    "15m": "15min",
+    "1h": "1h",
+    "4h": "4h",
+    "1d": "1D",
+}
+
+COLUMN_ALIASES = {
+    "日付": "日付", "日付け": "日付", "日時": "日付", "date": "日付", "datetime": "日付",
+    "time": "日付", "timestamp": "日付",
+    "始値": "始値", "open": "始値",
+    "高値": "高値", "high": "高値",
+    "安値": "安値", "low": "安値",
+    "終値": "終値", "close": "終値", "price": "終値",
+    "出来高": "出来高", "volume": "出来高",
+    "bid": "bid", "ask": "ask",
+}
+
+PRICE_COLUMNS = ["始値", "高値", "安値", "終値"]
+
+
+class NotSortedError(ValueError):
+    """チャンクの時系列が日付の昇順になっていない（並べ替えが必要）"""
+
+
+def _file_kind(source) -> str:
+    name = getattr(source, "name", source if isinstance(source, str) else "")
+    return "parquet" if os.path.splitext(str(name))[1].lower() in (".parquet", ".pq") else "csv"
+
+
+def iter_raw_chunks(source, chunksize: int = 500_000) -> Iterator[pd.DataFrame]:
+    # CSV / Parquet をチャンク単位で読み込む（ファイルパスでもアップロードファイルでも可）
+    if _file_kind(source) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize, thousands=",")
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    if values.dtype == object and values.astype(str).str.contains("年").any():
+        # investing.com の日本語形式（2024年01月05日）
+        return pd.to_datetime(values, format="%Y年%m月%d日", errors="coerce")
+    return pd.to_datetime(values, errors="coerce")
+
+
+def normalize_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    # 列名を 日付/始値/高値/安値/終値 にそろえ、価格を float32 にする
+    renamed = {}
+    for col in chunk.columns:
+        key = str(col).strip()
+        alias = COLUMN_ALIASES.get(key, COLUMN_ALIASES.get(key.lower()))
+        if alias and alias not in renamed.values():
+            renamed[col] = alias
+    df = chunk[list(renamed)].rename(columns=renamed)
+
+    if "日付" not in df.columns:
+        raise KeyError("列 '日付' がDataFrameに存在しません。")
+    if "終値" not in df.columns and {"bid", "ask"} <= set(df.columns):
+        df["終値"] = (pd.to_numeric(df["bid"], errors="coerce") + pd.to_numeric(df["ask"], errors="coerce")) / 2
+    if "終値" not in df.columns:
+        raise KeyError("列 '終値' がDataFrameに存在しません。")
+
+    out = pd.DataFrame({"日付": _parse_dates(df["日付"])})
+    close = pd.to_numeric(df["終値"], errors="coerce").astype(np.float32)
+    for col in PRICE_COLUMNS:
+        # ティックデータ（価格のみ）は4本値すべてを価格で埋める
+        out[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32) if col in df.columns else close
+    if "出来高" in df.columns:
+        out["出来高"] = pd.to_numeric(df["出来高"], errors="coerce").astype(np.float32)
+    return out.dropna(subset=["日付"])
+
+
+def resample_ohlc(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    # 4本値を上位足へ集約（始値=最初, 高値=最大, 安値=最小, 終値=最後, 出来高=合計）
+    agg = {"始値": "first", "高値": "max", "安値": "min", "終値": "last"}
+    if "出来高" in df.columns:
+        agg["出来高"] = "sum"
+    bars = df.resample(rule, on="日付").agg(agg).dropna(subset=["終値"])
+    return bars.reset_index().astype({col: np.float32 for col in agg})
+
+
+def _merge_bars(first: pd.DataFrame, second: pd.DataFrame) -> pd.DataFrame:
+    # 同じ時刻ラベルの2本のバーを1本にまとめる
+    merged = first.copy()
+    merged["高値"] = max(first["高値"].iloc[0], second["高値"].iloc[0])
+    merged["安値"] = min(first["安値"].iloc[0], second["安値"].iloc[0])
+    merged["終値"] = second["終値"].iloc[0]
+    if "出来高" in merged.columns:
+        merged["出来高"] = first["出来高"].iloc[0] + second["出来高"].iloc[0]
+    return merged
+
+
+def iter_resampled(chunks: Iterable[pd.DataFrame], rule: str) -> Iterator[pd.DataFrame]:
+    """
+    正規化済みチャンクを順に集約する。チャンク境界をまたぐ最後のバーは
+    集約途中の1本だけを次のチャンクへ持ち越すので、メモリはチャンク1つ分に収まる。
+    """
+    pending = None
+    last_date = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if not chunk["日付"].is_monotonic_increasing or (last_date is not None and chunk["日付"].iloc[0] < last_date):
+            raise NotSortedError("時系列が日付の昇順になっていません。")
+        last_date = chunk["日付"].iloc[-1]
+
+        bars = resample_ohlc(chunk, rule)
+        if pending is not None:
+            if bars["日付"].iloc[0] == pending["日付"].iloc[0]:
+                bars = pd.concat([_merge_bars(pending, bars.iloc[:1]), bars.iloc[1:]], ignore_index=True)
+            else:
+                bars = pd.concat([pending, bars], ignore_index=True)
+
+        pending = bars.iloc[-1:].reset_index(drop=True)
+        if len(bars) > 1:
+            yield bars.iloc[:-1].reset_index(drop=True)
+
+    if pending is not None:
+        yield pending
+
+
+class ChunkedIndicators:
+    """
+    calculate_indicators と同じ指標をチャンクごとに計算する。
+
+    移動窓の計算には直前チャンクの末尾だけを足し、EMA は前回の値から
+    継続するので、全期間を一度に計算した結果と一致する（出力は float32）。
+    """
+
+    TAIL = 32  # 最長の窓（SMA20 / BB20、%D の元になる %K の14+2本）より長く取る
+
+    def __init__(self):
+        self._tail = None
+        self._ema = {"ema12": None, "ema26": None, "signal": None}
+
+    @staticmethod
+    def _ewm(values: pd.Series, span: int, prev: Optional[float]) -> pd.Series:
+        if prev is None:
+            return values.ewm(span=span, adjust=False).mean()
+        extended = pd.concat([pd.Series([prev]), values], ignore_index=True)
+        return pd.Series(extended.ewm(span=span, adjust=False).mean().to_numpy()[1:], index=values.index)
+
+    def process(self, bars: pd.DataFrame) -> pd.DataFrame:
+        n_tail = 0 if self._tail is None else len(self._tail)
+        df = bars if self._tail is None else pd.concat([self._tail, bars], ignore_index=True)
+        close = df["終値"].astype(np.float64)
+        out = pd.DataFrame(index=df.index)
+
+        out["SMA_5"] = close.rolling(window=5).mean()
+        out["SMA_20"] = close.rolling(window=20).mean()
+
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
+        out["RSI_14"] = 100 - (100 / (1 + gain / loss))
+
+        new_close = close.iloc[n_tail:]
+        ema12 = self._ewm(new_close, 12, self._ema["ema12"])
+        ema26 = self._ewm(new_close, 26, self._ema["ema26"])
+        macd = ema12 - ema26
+        signal = self._ewm(macd, 9, self._ema["signal"])
+        out["MACD"] = np.nan
+        out["MACD_Signal"] = np.nan
+        out.loc[new_close.index, "MACD"] = macd
+        out.loc[new_close.index, "MACD_Signal"] = signal
+
+        std = close.rolling(window=20).std()
+        out["BB_Middle"] = out["SMA_20"]
+        out["BB_Upper"] = out["SMA_20"] + 2 * std
+        out["BB_Lower"] = out["SMA_20"] - 2 * std
+
+        low14 = df["安値"].astype(np.float64).rolling(window=14).min()
+        high14 = df["高値"].astype(np.float64).rolling(window=14).max()
+        out["Stoch_K_14_3"] = 100 * (close - low14) / (high14 - low14)
+        out["Stoch_D_14_3"] = out["Stoch_K_14_3"].rolling(window=3).mean()
+
+        if len(new_close):
+            self._ema = {"ema12": ema12.iloc[-1], "ema26": ema26.iloc[-1], "signal": signal.iloc[-1]}
+        self._tail = df.iloc[-self.TAIL:].reset_index(drop=True)
+
+        result = pd.concat([df, out.astype(np.float32)], axis=1).iloc[n_tail:]
+        return result.reset_index(drop=True)
+
+
+def iter_indicator_chunks(source, timeframe: str = "1m", chunksize: int = 500_000) -> Iterator[pd.DataFrame]:
+    # 読み込み → 正規化 → 時間足の集約 → 指標計算 をチャンク単位で流す
+    engine = ChunkedIndicators()
+    raw = (normalize_chunk(chunk) for chunk in iter_raw_chunks(source, chunksize))
+    for bars in iter_resampled(raw, TIMEFRAMES.get(timeframe, timeframe)):
+        yield engine.process(bars)
+
+
+def write_indicators_parquet(source, output_path: str, timeframe: str = "1m", chunksize: int = 500_000) -> int:
+    # 指標付きの足をチャンクごとに Parquet へ追記する（戻り値は書き込んだ本数）
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in iter_indicator_chunks(source, timeframe, chunksize):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _rewind(source) -> bool:
+    # もう一度先頭から読めるようにする（ファイルパスはそのまま、アップロードファイルは seek）
+    if isinstance(source, (str, os.PathLike)):
+        return True
+    if hasattr(source, "seek"):
+        source.seek(0)
+        return True
+    return False
+
+
+def _load_sorted(chunks: Iterable[pd.DataFrame], rule: Optional[str]) -> pd.DataFrame:
+    # 全体を読み込んでから並べ替える（降順ファイル用。生データ全体がメモリに載る）
+    df = pd.concat(chunks, ignore_index=True)
+    if not df["日付"].is_monotonic_increasing:
+        df = df.sort_values("日付", kind="stable").reset_index(drop=True)
+    return resample_ohlc(df, rule) if rule else df
+
+
+def load_ohlc_file(source, timeframe: Optional[str] = None, chunksize: int = 500_000) -> pd.DataFrame:
+    """
+    アップロードされた CSV / Parquet を読み込み、指定の時間足の4本値にして返す。
+
+    日付の昇順に並んだファイルは iter_resampled でチャンクごとに集約し、ティックデータ
+    全体をメモリに載せない。investing.com の CSV のような降順（または途中で順序が崩れる）
+    ファイルだけ、全体を読み込んで並べ替える。
+    """
+    rule = TIMEFRAMES.get(timeframe, timeframe) if timeframe else None
+    chunks = (normalize_chunk(chunk) for chunk in iter_raw_chunks(source, chunksize))
+    first = next(chunks, None)
+    if first is None:
+        return pd.DataFrame(columns=["日付"] + PRICE_COLUMNS)
+    if not rule or not first["日付"].is_monotonic_increasing:
+        return _load_sorted(itertools.chain([first], chunks), rule)
+
+    try:
+        bars = list(iter_resampled(itertools.chain([first], chunks), rule))
+    except NotSortedError:
+        if not _rewind(source):
+            raise
+        return _load_sorted((normalize_chunk(chunk) for chunk in iter_raw_chunks(source, chunksize)), rule)
+    if not bars:
+        return pd.DataFrame(columns=["日付"] + PRICE_COLUMNS)
+    return pd.concat(bars, ignore_index=True)
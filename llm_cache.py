@@ -0,0 +1,141 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlite_store import SQLiteStore
+
+
+def make_cache_key(kind: str, model: str, variables: dict) -> str:
+    # プロンプト変数は表示用に丸めた文字列なので、そのままキーにすれば指標の量子化を兼ねる
+    payload = json.dumps({"kind": kind, "model": model, "variables": variables}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chain_cache_key(chain, variables: dict, kind: str) -> str:
+    model = getattr(chain.llm, "model_name", type(chain.llm).__name__)
+    return make_cache_key(kind, model, variables)
+
+
+class SQLiteResponseCache(SQLiteStore):
+    """プロセスや再起動をまたいで共有する LLM 応答キャッシュ"""
+
+    def __init__(self, path: str, ttl: float = 12 * 3600):
+        super().__init__(path)
+        self.ttl = ttl
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(応答, 保存時刻) を返す。無いか期限切れなら None"""
+        row = self._conn().execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        conn.commit()
+
+    def purge_expired(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        conn.commit()
+
+
+class LLMResponseCache:
+    """
+    LRU + TTL のメモリキャッシュ。backend を渡すとメモリに無い応答をそこから補う。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 12 * 3600, backend: Optional[SQLiteResponseCache] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._stats = {"hits": 0, "backend_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, created_at = item
+                if time.time() - created_at <= self.ttl:
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._data[key]
+
+        item = self.backend.get(key) if self.backend else None
+        with self._lock:
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["backend_hits"] += 1
+            # 期限はバックエンドに保存した時刻から数える（メモリに載せ直しても延ばさない）
+            self._put(key, *item)
+        return item[0]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._put(key, value, time.time())
+        if self.backend:
+            self.backend.set(key, value)
+
+    def _put(self, key: str, value: str, created_at: float):
+        self._data[key] = (value, created_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    @contextmanager
+    def lock_for(self, key: str):
+        # 同じ入力への同時リクエストで LLM を二重に呼ばないためのキー単位ロック。
+        # 待っている呼び出しが無くなったら消すので、LLM 呼び出しが失敗したキーも残らない
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+        total = stats["hits"] + stats["backend_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["backend_hits"]) / total if total else 0.0
+        return stats
+
+
+def run_cached(chain, variables: dict, cache: Optional[LLMResponseCache], kind: str = "strategy"):
+    """chain.run の結果をキャッシュ経由で返す。戻り値は (テキスト, キャッシュ由来か)"""
+    if cache is None:
+        return chain.run(variables), False
+
+    key = chain_cache_key(chain, variables, kind)
+    with cache.lock_for(key):
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+        result = chain.run(variables)
+        cache.set(key, result)
+        return result, False
@@ -0,0 +1,79 @@
+from typing import Iterator, Optional
+
+from llm_cache import LLMResponseCache, chain_cache_key
+
+FAKE_STRATEGY = """
+1. 現在のトレンド分析
+（オフライン用のダミー出力）SMA5とSMA20の位置関係から短期トレンドを確認してください。
+
+2. 勝率の高いエントリータイミング
+ロング: RSIが30付近から反発したタイミング
+ショート: ボリンジャーバンド上限でのストキャスティクスのデッドクロス
+
+3. 利確と損切り目安
+直近高値・安値を目安に設定してください。
+
+4. 注意点とアドバイス
+経済指標の発表前後は値動きが荒くなるため注意してください。
+"""
+
+FAKE_SUMMARY = """📊（オフライン用のダミー要約）短期トレンドと過熱感を確認し、RSI・BBを目安にエントリーを検討。
+#FX #テクニカル分析 #LazyTech
+"""
+
+
+def load_fake_llm(responses: Optional[list] = None, sleep: float = 0.01):
+    # API キー無しで動かすための、1文字ずつストリーミングするダミーLLM
+    from langchain_core.language_models import FakeListChatModel
+
+    return FakeListChatModel(responses=responses or [FAKE_STRATEGY], sleep=sleep)
+
+
+def stream_chain(chain, variables: dict) -> Iterator[str]:
+    # LLMChain のプロンプトを組み立て、LLM のトークンを届いた順に返す
+    prompt_value = chain.prompt.format_prompt(**variables)
+    for chunk in chain.llm.stream(prompt_value):
+        text = getattr(chunk, "content", chunk)
+        if text:
+            yield text
+
+
+class LLMStream:
+    """
+    チェーンの出力をストリーミングで返すイテレータ。
+
+    キャッシュに同じ入力の応答があればそれを一度に返し、無ければ
+    ストリーミングしながら全文を組み立てて、最後まで届いたらキャッシュに保存する。
+    """
+
+    def __init__(self, chain, variables: dict, cache: Optional[LLMResponseCache] = None, kind: str = "strategy"):
+        self.chain = chain
+        self.variables = variables
+        self.cache = cache
+        self.kind = kind
+        self.from_cache = False
+        self.text = ""
+
+    def _stream(self) -> Iterator[str]:
+        parts = []
+        for token in stream_chain(self.chain, self.variables):
+            parts.append(token)
+            yield token
+        self.text = "".join(parts)
+
+    def __iter__(self) -> Iterator[str]:
+        if self.cache is None:
+            yield from self._stream()
+            return
+
+        key = chain_cache_key(self.chain, self.variables, self.kind)
+        with self.cache.lock_for(key):
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.from_cache = True
+                self.text = cached
+                yield cached
+                return
+
+            yield from self._stream()
+            self.cache.set(key, self.text)
@@ -0,0 +1,105 @@
+"""
+OpenAI 互換の Chat Completions API を返すローカルのダミーサーバー。
+
+API キーやネットワーク無しで、並行生成・再試行・タイムアウトの動きを確認するために使う。
+
+    python mock_llm_server.py --port 8765 --latency 1.0 --failure-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=dummy streamlit run app.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from aiohttp import web
+
+from llm_streaming import FAKE_STRATEGY
+
+
+def create_app(latency: float = 0.5, jitter: float = 0.0, failure_rate: float = 0.0,
+               response_text: str = FAKE_STRATEGY) -> web.Application:
+    app = web.Application()
+    app["stats"] = {"requests": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        stats = request.app["stats"]
+        body = await request.json()
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(latency + random.uniform(0, jitter))
+            if random.random() < failure_rate:
+                stats["failures"] += 1
+                return web.json_response({"error": {"message": "mock rate limit", "type": "rate_limit"}}, status=429)
+
+            model = body.get("model", "mock")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", []))
+
+            if not body.get("stream"):
+                return web.json_response({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": response_text}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(response_text),
+                              "total_tokens": prompt_tokens + len(response_text)},
+                })
+
+            # ストリーミング（SSE）は数文字ずつ返す
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            for i in range(0, len(response_text), 8):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": response_text[i:i + 8]}, "finish_reason": None}],
+                }
+                await resp.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                await asyncio.sleep(0.005)
+            done = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            await resp.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            await resp.write_eof()
+            return resp
+        finally:
+            stats["in_flight"] -= 1
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(request.app["stats"])
+
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def start_mock_server(port: int = 0, **options):
+    """同じイベントループ内でサーバーを起動し (runner, base_url) を返す。終了は runner.cleanup()"""
+    runner = web.AppRunner(create_app(**options))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    actual_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{actual_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 互換のダミー LLM サーバー")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="1リクエストあたりの待ち時間（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="待ち時間に加える最大のランダム時間（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="429 を返す割合（0〜1）")
+    args = parser.parse_args()
+    web.run_app(create_app(args.latency, args.jitter, args.failure_rate), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import datetime
+import json
+import os
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import pandas as pd
+
+COLUMN_MAP = {"Date": "日付", "Open": "始値", "High": "高値", "Low": "安値", "Close": "終値"}
+
+
+def normalize_yf_frame(data: pd.DataFrame) -> pd.DataFrame:
+    # yfinance の戻り値を 日付/始値/高値/安値/終値 の列を持つフレームにそろえる
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    data = data.reset_index()
+    data.rename(columns=COLUMN_MAP, inplace=True)
+    return data
+
+
+def yfinance_fetcher(symbol: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+    """
+    日足を取得する。通信エラーやレート制限は例外を投げ、その期間に足が無いだけ
+    （休場日など）の場合は空のフレームを返す。
+    """
+    import yfinance as yf
+    from yfinance.exceptions import YFPricesMissingError
+
+    # yf.download はスレッド間で共有する状態を持つため、並行取得できる Ticker.history を使う
+    try:
+        data = yf.Ticker(symbol).history(start=start, end=end, actions=False, raise_errors=True)
+    except YFPricesMissingError:
+        data = None
+    if data is None or data.empty:
+        return pd.DataFrame(columns=list(COLUMN_MAP.values()))
+    data.index = data.index.tz_localize(None)
+    return normalize_yf_frame(data)
+
+
+def _to_date(value) -> datetime.date:
+    return pd.Timestamp(value).date()
+
+
+class OHLCCache:
+    """
+    銘柄ごとの日足を Parquet でディスクに保存するキャッシュ。
+
+    取得済みの期間 [start, end) を銘柄ごとに記録し、要求された期間のうち
+    不足している両端だけを fetcher で取得する。前日・当日分は確定していない
+    可能性があるため取得済み期間には含めず、次回以降も取り直す。
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        fetcher: Callable[[str, datetime.date, datetime.date], pd.DataFrame] = yfinance_fetcher,
+        max_symbols: int = 200,
+        max_bytes: int = 512 * 1024 * 1024,
+        today: Optional[Callable[[], datetime.date]] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher
+        self.max_symbols = max_symbols
+        self.max_bytes = max_bytes
+        self._today = today or datetime.date.today
+        # _lock はインデックスと統計だけを守る。通信を含む取得は銘柄ごとのロックで直列化する
+        self._lock = threading.Lock()
+        self._symbol_locks = {}
+        self._stats = {"requests": 0, "hits": 0, "partial_hits": 0, "misses": 0,
+                       "fetches": 0, "fetched_rows": 0, "fetch_errors": 0, "evictions": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    # --- インデックス（取得済み期間と最終アクセス時刻） ---
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    @contextmanager
+    def _index_file_lock(self):
+        # 画面・ワーカー・CLI が同じディレクトリを使っても index.json の更新が消えないよう、
+        # 読み直し〜保存をプロセス間のファイルロックで囲む（fcntl が無い環境ではプロセス内のみ）
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, self.LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        tmp = self._index_path() + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp, self._index_path())
+
+    def _data_path(self, symbol: str) -> str:
+        return os.path.join(self.cache_dir, urllib.parse.quote(symbol, safe="") + ".parquet")
+
+    # --- 読み書き ---
+    def _read(self, symbol: str) -> pd.DataFrame:
+        try:
+            return pd.read_parquet(self._data_path(symbol))
+        except (FileNotFoundError, OSError):
+            return pd.DataFrame()
+
+    def _write(self, symbol: str, df: pd.DataFrame) -> int:
+        path = self._data_path(symbol)
+        tmp = path + f".{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return os.path.getsize(path)
+
+    def _fetch(self, symbol: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        with self._lock:
+            self._stats["fetches"] += 1
+        df = self.fetcher(symbol, start, end)
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df = df.copy()
+        df["日付"] = pd.to_datetime(df["日付"])
+        with self._lock:
+            self._stats["fetched_rows"] += len(df)
+        return df
+
+    def get(self, symbol: str, start, end) -> pd.DataFrame:
+        """
+        期間 [start, end) の日足を返す。不足分の取得に失敗した場合は、手元に古い
+        データがあっても例外を投げる（古いデータで続けてよい場合は get_with_status）。
+        """
+        df, error = self._get(symbol, start, end)
+        if error is not None:
+            raise error
+        return df
+
+    def get_with_status(self, symbol: str, start, end) -> tuple:
+        """
+        期間 [start, end) の日足と警告文を返す。
+
+        不足分の取得に失敗しても手元にデータがあればそれを返し、警告文で知らせる
+        （取得できていれば警告文は None）。手元にデータが無い場合は例外を投げる。
+        """
+        df, error = self._get(symbol, start, end)
+        if error is None:
+            return df, None
+        if df.empty:
+            raise error
+        first, last = df["日付"].iloc[0].date(), df["日付"].iloc[-1].date()
+        return df, (f"{symbol} の最新データを取得できなかったため、手元にある {first}〜{last} のデータを"
+                    f"使っています（{type(error).__name__}: {error}）")
+
+    def _get(self, symbol: str, start, end) -> tuple:
+        """
+        (期間内の日足, 取得エラー) を返す。
+
+        取得（通信）中は同じ銘柄の呼び出しだけを待たせ、ほかの銘柄は並行に処理できる。
+        取得に失敗した端は取得済み期間を広げず、次回また取り直す。手元にデータが
+        まったく無いまま失敗した場合は例外をそのまま投げる。
+        """
+        start, end = _to_date(start), _to_date(end)
+        with self._symbol_lock(symbol):
+            with self._lock:
+                self._stats["requests"] += 1
+                # 別プロセスが更新している可能性があるため毎回読み直す
+                with self._index_file_lock():
+                    self._index = self._load_index()
+                entry = self._index.get(symbol)
+            cached = self._read(symbol) if entry else pd.DataFrame()
+            if entry and cached.empty:
+                # インデックスだけ残ってデータファイルが消えている場合は取り直す
+                entry = None
+
+            if entry:
+                covered_start, covered_end = _to_date(entry["start"]), _to_date(entry["end"])
+                ranges = []
+                if start < covered_start:
+                    ranges.append((start, covered_start))
+                if end > covered_end:
+                    # 取得済み期間と連続させるため、右端は常に covered_end から取得する
+                    ranges.append((covered_end, end))
+            else:
+                covered_start, covered_end = start, start
+                ranges = [(start, end)]
+
+            with self._lock:
+                if not ranges:
+                    self._stats["hits"] += 1
+                elif entry:
+                    self._stats["partial_hits"] += 1
+                else:
+                    self._stats["misses"] += 1
+
+            new_start, new_end = covered_start, covered_end
+            fetched, error = [], None
+            for s, e in ranges:
+                try:
+                    df = self._fetch(symbol, s, e)
+                except Exception as exc:
+                    error = exc
+                    with self._lock:
+                        self._stats["fetch_errors"] += 1
+                    continue
+                # 取得に成功した端だけ取得済み期間を広げる（空でも休場日なら取得済みとみなす）。
+                # 前日以降の足はサーバーの日付と取引所の日付がずれると未確定のことがあるため含めない
+                new_start = min(new_start, s)
+                new_end = max(new_end, min(e, self._today() - datetime.timedelta(days=1)))
+                if not df.empty:
+                    fetched.append(df)
+
+            if fetched:
+                merged = pd.concat([f for f in [cached] + fetched if not f.empty], ignore_index=True)
+                merged = merged.drop_duplicates(subset="日付", keep="last")
+                merged = merged.sort_values("日付").reset_index(drop=True)
+                size = self._write(symbol, merged)
+            elif not cached.empty:
+                merged, size = cached, entry.get("bytes", 0)
+            elif error is not None:
+                raise error
+            else:
+                return pd.DataFrame(columns=list(COLUMN_MAP.values())), None
+
+            with self._lock, self._index_file_lock():
+                # 取得中に別プロセスが書いた内容を消さないよう、読み直してから自分の銘柄だけ更新する
+                self._index = self._load_index()
+                self._index[symbol] = {"start": new_start.isoformat(), "end": max(new_start, new_end).isoformat(),
+                                       "bytes": size, "last_access": time.time()}
+                self._evict(keep=symbol)
+                self._save_index()
+
+        mask = (merged["日付"] >= pd.Timestamp(start)) & (merged["日付"] < pd.Timestamp(end))
+        return merged.loc[mask].reset_index(drop=True), error
+
+    # --- 追い出し（最終アクセスが古い銘柄から） ---
+    def _evict(self, keep: Optional[str] = None):
+        def total_bytes():
+            return sum(e.get("bytes", 0) for e in self._index.values())
+
+        candidates = sorted(
+            (s for s in self._index if s != keep),
+            key=lambda s: self._index[s].get("last_access", 0),
+        )
+        for symbol in candidates:
+            if len(self._index) <= self.max_symbols and total_bytes() <= self.max_bytes:
+                break
+            self._index.pop(symbol, None)
+            try:
+                os.remove(self._data_path(symbol))
+            except FileNotFoundError:
+                pass
+            self._stats["evictions"] += 1
+
+    def invalidate(self, symbol: str):
+        with self._lock, self._index_file_lock():
+            self._index = self._load_index()
+            self._index.pop(symbol, None)
+            try:
+                os.remove(self._data_path(symbol))
+            except FileNotFoundError:
+                pass
+            self._save_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["symbols"] = len(self._index)
+            stats["bytes"] = sum(e.get("bytes", 0) for e in self._index.values())
+        served = stats["requests"]
+        stats["hit_rate"] = stats["hits"] / served if served else 0.0
+        return stats
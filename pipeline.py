@@ -0,0 +1,222 @@
+"""
+株価の取得 → 指標計算 → 最新行のプロンプト変数 → 戦略生成 のパイプライン。
+
+Streamlit の画面・事前計算ワーカー・バッチ CLI・HTTP サーバー（pipeline_server.py）から
+同じ処理を呼べるよう、画面に依存しない関数としてまとめる。
+
+    python pipeline.py symbols.txt --output results.jsonl --start 2023-01-01
+    python pipeline.py symbols.txt --output results.parquet --indicators-output indicators.parquet --no-strategy
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from async_llm import AsyncLLMRunner
+from indicators import INDICATOR_COLUMNS, calculate_indicators, latest_complete_row
+from instrumentation import METRICS
+from llm_cache import LLMResponseCache, SQLiteResponseCache, run_cached
+from ohlc_cache import OHLCCache, yfinance_fetcher
+from strategy_chain import build_strategy_inputs, get_strategy_chain
+from symbols import parse_symbols
+
+# 結果レコードに含める最新行の値
+RECORD_COLUMNS = ["終値"] + INDICATOR_COLUMNS
+
+
+def llm_available(api_key: Optional[str]) -> bool:
+    return bool(api_key or os.getenv("FAKE_LLM"))
+
+
+def load_history(symbol: str, start, end, cache: Optional[OHLCCache] = None) -> tuple:
+    """
+    日足を取得する。cache を渡すとディスクキャッシュ経由（不足分だけ取得）。
+
+    戻り値は (データ, 警告文)。最新分の取得に失敗して手元の古いデータを使う場合だけ
+    警告文が入るので、呼び出し側で必ず表示・記録する。
+    """
+    with METRICS.timer("fetch_ohlc", symbol=symbol):
+        if cache is not None:
+            data, warning = cache.get_with_status(symbol, start, end)
+            if warning:
+                METRICS.increment("stale_ohlc", symbol=symbol)
+            return data, warning
+        return yfinance_fetcher(symbol, start, end), None
+
+
+def prepare(symbol: str, data: pd.DataFrame, backend: str = "pandas") -> dict:
+    """
+    指標を計算し、戦略生成に渡すプロンプト変数まで作る。
+
+    データが足りず主要指標が揃わない場合、latest と inputs は None になる。
+    """
+    with METRICS.timer("calculate_indicators", rows=len(data)):
+        df = calculate_indicators(data, backend=backend)
+    latest = latest_complete_row(df)
+    return {
+        "symbol": symbol,
+        "df": df,
+        "latest": latest,
+        "inputs": build_strategy_inputs(symbol, latest) if latest is not None else None,
+    }
+
+
+def generate_strategy(prepared: dict, api_key: Optional[str], llm_cache: Optional[LLMResponseCache] = None):
+    """prepare() の結果から戦略を生成する。戻り値は (テキスト, キャッシュ由来か)"""
+    chain = get_strategy_chain(api_key=api_key)
+    with METRICS.timer("llm_strategy"):
+        return run_cached(chain, prepared["inputs"], llm_cache)
+
+
+def analyze(symbol: str, start, end, api_key: Optional[str] = None, cache: Optional[OHLCCache] = None,
+            llm_cache: Optional[LLMResponseCache] = None, backend: str = "pandas", with_strategy: bool = True) -> dict:
+    """1銘柄を最後まで処理する。失敗は例外ではなく結果の error に入れて返す"""
+    result = {"symbol": symbol, "df": None, "latest": None, "inputs": None,
+              "strategy": None, "from_cache": False, "warning": None, "error": None}
+    try:
+        data, result["warning"] = load_history(symbol, start, end, cache)
+        if data.empty:
+            raise ValueError("データが取得できませんでした。銘柄コードまたは日付範囲を見直してください。")
+        result.update(prepare(symbol, data, backend))
+        if result["inputs"] is None:
+            raise ValueError("指標計算に必要なデータが不足しています。")
+        if with_strategy and llm_available(api_key):
+            result["strategy"], result["from_cache"] = generate_strategy(result, api_key, llm_cache)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def analyze_many(symbols: list, start, end, api_key: Optional[str] = None,
+                       cache: Optional[OHLCCache] = None, llm_cache: Optional[LLMResponseCache] = None,
+                       backend: str = "pandas", with_strategy: bool = True,
+                       runner: Optional[AsyncLLMRunner] = None, max_workers: int = 8) -> list:
+    """
+    複数銘柄をまとめて処理する。
+
+    取得と指標計算はスレッドで max_workers 銘柄ずつ並行に、戦略生成は AsyncLLMRunner で
+    並行・レート制限つきに実行する。結果は symbols と同じ順番。
+    """
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def prepare_one(symbol: str) -> dict:
+        async with semaphore:
+            return await asyncio.to_thread(analyze, symbol, start, end, cache=cache, backend=backend,
+                                           with_strategy=False)
+
+    results = await asyncio.gather(*(prepare_one(symbol) for symbol in symbols))
+
+    if with_strategy and llm_available(api_key):
+        runner = runner or AsyncLLMRunner(cache=llm_cache)
+        inputs = {r["symbol"]: r["inputs"] for r in results if r["error"] is None}
+        generated = await runner.generate(inputs, get_strategy_chain(api_key=api_key, max_retries=0)) if inputs else {}
+        for r in results:
+            g = generated.get(r["symbol"])
+            if g:
+                r["strategy"], r["error"], r["from_cache"] = g["strategy"], g["error"], g["from_cache"]
+    return results
+
+
+def _json_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    return value
+
+
+def to_record(result: dict) -> dict:
+    """JSON / Parquet に書ける1銘柄1行の辞書にする（指標は最新行の値）"""
+    latest = result.get("latest")
+    return {
+        "symbol": result["symbol"],
+        "latest_date": str(latest["日付"].date()) if latest is not None else None,
+        "rows": len(result["df"]) if result.get("df") is not None else 0,
+        **{col: _json_value(latest[col]) if latest is not None else None for col in RECORD_COLUMNS},
+        "strategy": result.get("strategy"),
+        "from_cache": bool(result.get("from_cache")),
+        "warning": result.get("warning"),
+        "error": result.get("error"),
+    }
+
+
+def indicators_frame(results: list) -> pd.DataFrame:
+    """全銘柄の指標を 銘柄 列つきの縦長フレームにまとめる"""
+    frames = [r["df"].assign(銘柄=r["symbol"]) for r in results if r.get("df") is not None]
+    if not frames:
+        return pd.DataFrame(columns=["銘柄", "日付"])
+    df = pd.concat(frames, ignore_index=True)
+    return df[["銘柄"] + [c for c in df.columns if c != "銘柄"]]
+
+
+def write_records(records: list, path: str):
+    # 拡張子で形式を決める（.parquet 以外は JSONL）
+    if path.endswith(".parquet"):
+        pd.DataFrame(records).to_parquet(path, index=False)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="銘柄一覧ファイルから指標と戦略をまとめて生成する")
+    parser.add_argument("symbols_file", help="銘柄コードをカンマ・改行区切りで書いたファイル（- で標準入力）")
+    parser.add_argument("--output", default="results.jsonl", help="結果の出力先（.jsonl / .parquet）")
+    parser.add_argument("--indicators-output", help="全期間の指標を Parquet で保存する場合の出力先")
+    parser.add_argument("--start", default="2023-01-01", help="取得開始日")
+    parser.add_argument("--end", default=None, help="取得終了日（省略時は翌日＝当日分まで）")
+    parser.add_argument("--cache-dir", default=os.getenv("OHLC_CACHE_DIR", ".ohlc_cache"))
+    parser.add_argument("--backend", default=os.getenv("INDICATOR_BACKEND", "pandas"), help="指標計算のバックエンド")
+    parser.add_argument("--no-strategy", action="store_true", help="戦略は生成せず指標だけ出力する")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM の同時実行数")
+    args = parser.parse_args()
+
+    if args.symbols_file == "-":
+        import sys
+
+        text = sys.stdin.read()
+    else:
+        with open(args.symbols_file, encoding="utf-8") as f:
+            text = f.read()
+    symbols = parse_symbols(text)
+    if not symbols:
+        parser.error("銘柄が1つも指定されていません。")
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    with_strategy = not args.no_strategy
+    if with_strategy and not llm_available(api_key):
+        print("OPENAI_API_KEY が未設定のため、戦略は生成せず指標のみ出力します。")
+
+    db_path = os.getenv("LLM_CACHE_DB")
+    llm_cache = LLMResponseCache(backend=SQLiteResponseCache(db_path) if db_path else None)
+    end = args.end or (datetime.date.today() + datetime.timedelta(days=1))
+    results = asyncio.run(analyze_many(
+        symbols, args.start, end, api_key=api_key, cache=OHLCCache(args.cache_dir), llm_cache=llm_cache,
+        backend=args.backend, with_strategy=with_strategy,
+        runner=AsyncLLMRunner(concurrency=args.concurrency, cache=llm_cache),
+    ))
+
+    write_records([to_record(r) for r in results], args.output)
+    if args.indicators_output:
+        indicators_frame(results).to_parquet(args.indicators_output, index=False)
+
+    failed = [r for r in results if r["error"]]
+    print(f"{len(results) - len(failed)}/{len(results)} 銘柄を {args.output} に出力しました。")
+    for r in failed:
+        print(f"  {r['symbol']}: {r['error']}")
+    for r in results:
+        if r["warning"]:
+            print(f"  {r['symbol']}: {r['warning']}")
+    if len(failed) == len(results):
+        # 定期ジョブで失敗に気付けるよう、全銘柄失敗のときは終了コードを 1 にする
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+分析パイプライン（pipeline.py）を HTTP で呼べる軽量な非同期サーバー。
+
+ブラウザの画面を介さずに、他のサービスや定期ジョブから指標と戦略を取得するために使う。
+
+    python pipeline_server.py --port 8080
+    curl -X POST localhost:8080/analyze -d '{"symbol": "^N225", "start": "2024-01-01"}'
+    curl -X POST localhost:8080/analyze/batch -d '{"symbols": ["^N225", "USDJPY=X"], "strategy": false}'
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+from typing import Optional
+
+from aiohttp import web
+
+from async_llm import AsyncLLMRunner
+from instrumentation import METRICS
+from llm_cache import LLMResponseCache, SQLiteResponseCache
+from ohlc_cache import OHLCCache
+from pipeline import analyze_many, to_record
+from symbols import parse_symbols
+
+DEFAULT_START = "2023-01-01"
+MAX_BATCH_SYMBOLS = 200
+
+_dumps = functools.partial(json.dumps, ensure_ascii=False)
+
+
+def _parse_date(body: dict, name: str, default: datetime.date) -> datetime.date:
+    value = body.get(name)
+    if value is None or value == "":
+        return default
+    if not isinstance(value, str):
+        raise ValueError(f"{name} は YYYY-MM-DD 形式の文字列にしてください。")
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} は YYYY-MM-DD 形式の日付にしてください: {value}")
+
+
+def _parse_request(body: dict) -> tuple:
+    """リクエスト本文から (開始日, 終了日, 戦略を生成するか) を取り出す。不正な値は ValueError"""
+    start = _parse_date(body, "start", datetime.date.fromisoformat(DEFAULT_START))
+    # 省略時は当日の足も含めるため翌日まで
+    end = _parse_date(body, "end", datetime.date.today() + datetime.timedelta(days=1))
+    if start >= end:
+        raise ValueError("start は end より前の日付にしてください。")
+    with_strategy = body.get("strategy", True)
+    # "false" のような文字列を真と扱わないよう、JSON の true / false だけを受け付ける
+    if not isinstance(with_strategy, bool):
+        raise ValueError("strategy は true か false にしてください。")
+    return start, end, with_strategy
+
+
+def create_app(cache: OHLCCache, llm_cache: Optional[LLMResponseCache] = None, api_key: Optional[str] = None,
+               backend: str = "pandas", concurrency: int = 8) -> web.Application:
+    app = web.Application()
+    # 同時実行数とレート制限をサーバー全体で共有するため、ランナーは1つだけ作る
+    runner = AsyncLLMRunner(concurrency=concurrency, cache=llm_cache)
+
+    async def run(symbols: list, body: dict) -> list:
+        start, end, with_strategy = _parse_request(body)
+        # 取得と指標計算はスレッドで行うので、重い銘柄があってもイベントループは止まらない
+        with METRICS.timer("pipeline_request", symbols=len(symbols)):
+            results = await analyze_many(symbols, start, end, api_key=api_key, cache=cache, llm_cache=llm_cache,
+                                         backend=backend, with_strategy=with_strategy, runner=runner)
+        return [to_record(r) for r in results]
+
+    async def read_json(request: web.Request) -> dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="リクエスト本文は JSON にしてください。")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="リクエスト本文は JSON オブジェクトにしてください。")
+        return body
+
+    async def analyze_one(request: web.Request) -> web.Response:
+        body = await read_json(request)
+        symbol = str(body.get("symbol") or "").strip()
+        if not symbol:
+            raise web.HTTPBadRequest(text="symbol を指定してください。")
+        try:
+            records = await run([symbol], body)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response(records[0], status=200 if records[0]["error"] is None else 422, dumps=_dumps)
+
+    async def analyze_batch(request: web.Request) -> web.Response:
+        body = await read_json(request)
+        symbols = body.get("symbols") or []
+        symbols = parse_symbols(symbols if isinstance(symbols, str) else ",".join(map(str, symbols)))
+        if not symbols:
+            raise web.HTTPBadRequest(text="symbols を指定してください。")
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            raise web.HTTPBadRequest(text=f"1回に指定できる銘柄は {MAX_BATCH_SYMBOLS} 件までです。")
+        try:
+            records = await run(symbols, body)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response({"results": records}, dumps=_dumps)
+
+    async def healthz(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "ohlc_cache": cache.stats(),
+                                  "llm_cache": llm_cache.stats() if llm_cache else None})
+
+    app.router.add_post("/analyze", analyze_one)
+    app.router.add_post("/analyze/batch", analyze_batch)
+    app.router.add_get("/healthz", healthz)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析パイプラインの HTTP サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-dir", default=os.getenv("OHLC_CACHE_DIR", ".ohlc_cache"))
+    parser.add_argument("--backend", default=os.getenv("INDICATOR_BACKEND", "pandas"), help="指標計算のバックエンド")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM の同時実行数")
+    args = parser.parse_args()
+
+    db_path = os.getenv("LLM_CACHE_DB")
+    app = create_app(
+        cache=OHLCCache(args.cache_dir),
+        llm_cache=LLMResponseCache(backend=SQLiteResponseCache(db_path) if db_path else None),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        backend=args.backend,
+        concurrency=args.concurrency,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import io
+import json
+import time
+from typing import Optional
+
+import pandas as pd
+
+from sqlite_store import SQLiteStore
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)}秒"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}分"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)}時間"
+    return f"{int(seconds // 86400)}日"
+
+
+class PrecomputeStore(SQLiteStore):
+    """
+    バックグラウンドワーカーが事前計算した 株価・指標・戦略 を共有する SQLite ストア。
+
+    ワーカーが書き込み、画面（複数レプリカ可）は読むだけ。WAL モードなので
+    書き込み中でも読み込みはブロックされない。
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS precomputed ("
+            " symbol TEXT PRIMARY KEY,"
+            " updated_at REAL NOT NULL,"
+            " start TEXT NOT NULL,"
+            " end TEXT NOT NULL,"
+            " latest_date TEXT,"
+            " inputs TEXT,"
+            " strategy TEXT,"
+            " indicators BLOB NOT NULL)"
+        )
+        conn.commit()
+
+    def put(self, symbol: str, df: pd.DataFrame, start, end,
+            inputs: Optional[dict] = None, strategy: Optional[str] = None):
+        buf = io.BytesIO()
+        df.to_parquet(buf, index=False)
+        latest_date = str(df["日付"].iloc[-1]) if len(df) else None
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO precomputed"
+            " (symbol, updated_at, start, end, latest_date, inputs, strategy, indicators)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (symbol, time.time(), str(start), str(end), latest_date,
+             json.dumps(inputs, ensure_ascii=False) if inputs else None, strategy, buf.getvalue()),
+        )
+        conn.commit()
+
+    def get_meta(self, symbol: str) -> Optional[dict]:
+        # 画面の再実行ごとに呼ぶので、指標データ（BLOB）は読まない
+        row = self._conn().execute(
+            "SELECT updated_at, start, end, latest_date, strategy IS NOT NULL FROM precomputed WHERE symbol = ?",
+            (symbol,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "symbol": symbol,
+            "updated_at": row[0],
+            "age_seconds": time.time() - row[0],
+            "start": row[1],
+            "end": row[2],
+            "latest_date": row[3],
+            "has_strategy": bool(row[4]),
+        }
+
+    def get(self, symbol: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT updated_at, start, end, latest_date, inputs, strategy, indicators FROM precomputed WHERE symbol = ?",
+            (symbol,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "symbol": symbol,
+            "updated_at": row[0],
+            "age_seconds": time.time() - row[0],
+            "start": row[1],
+            "end": row[2],
+            "latest_date": row[3],
+            "inputs": json.loads(row[4]) if row[4] else None,
+            "strategy": row[5],
+            "df": pd.read_parquet(io.BytesIO(row[6])),
+        }
+
+    def status(self) -> list:
+        rows = self._conn().execute(
+            "SELECT symbol, updated_at, latest_date, strategy IS NOT NULL FROM precomputed ORDER BY symbol"
+        ).fetchall()
+        now = time.time()
+        return [
+            {"symbol": s, "age_seconds": now - u, "latest_date": d, "has_strategy": bool(h)}
+            for s, u, d, h in rows
+        ]
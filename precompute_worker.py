@@ -0,0 +1,153 @@
+"""
+人気銘柄を定期的に事前計算するバックグラウンドワーカー（Streamlit とは別プロセスで動かす）。
+
+株価の取得 → 指標計算 → 戦略生成 を銘柄ごとのスケジュールで実行し、結果を
+PrecomputeStore に書き込む。画面はストアから読むだけなので待ち時間なしで表示できる。
+
+    python precompute_worker.py --store precompute.db --fx-interval 15
+    python precompute_worker.py --once   # 1回だけ全銘柄を更新して終了
+"""
+import argparse
+import datetime
+import logging
+import os
+import signal
+import time
+
+from llm_cache import LLMResponseCache, SQLiteResponseCache
+from ohlc_cache import OHLCCache
+from pipeline import generate_strategy, llm_available, load_history, prepare
+from precompute_store import PrecomputeStore
+from symbols import SYMBOL_OPTIONS
+
+logger = logging.getLogger("precompute_worker")
+
+# 株価指数は各市場の引け後（UTC）に1日1回更新する
+DAILY_CLOSE_UTC = {
+    "^N225": "06:30",
+    "^GSPC": "21:30",
+    "^NDX": "21:30",
+}
+DEFAULT_CLOSE_UTC = "22:00"
+RETRY_AFTER_ERROR = 5 * 60
+
+
+def is_fx(symbol: str) -> bool:
+    return symbol.endswith("=X")
+
+
+def next_daily_run(now: datetime.datetime, hhmm: str) -> datetime.datetime:
+    hour, minute = (int(v) for v in hhmm.split(":"))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += datetime.timedelta(days=1)
+    return run_at
+
+
+class PrecomputeWorker:
+    def __init__(self, store: PrecomputeStore, cache: OHLCCache, symbols: list, start_date: datetime.date,
+                 fx_interval_minutes: float = 15, api_key: str = None, llm_cache: LLMResponseCache = None):
+        self.store = store
+        self.cache = cache
+        self.symbols = symbols
+        self.start_date = start_date
+        self.fx_interval = datetime.timedelta(minutes=fx_interval_minutes)
+        self.api_key = api_key
+        self.llm_cache = llm_cache
+        self._stopped = False
+
+    def next_run(self, symbol: str, now: datetime.datetime) -> datetime.datetime:
+        if is_fx(symbol):
+            return now + self.fx_interval
+        return next_daily_run(now, DAILY_CLOSE_UTC.get(symbol, DEFAULT_CLOSE_UTC))
+
+    def refresh(self, symbol: str):
+        started = time.perf_counter()
+        # 当日の足（FX は取引中の足）も含めるため終了日は翌日にする
+        end_date = datetime.date.today() + datetime.timedelta(days=1)
+        data, warning = load_history(symbol, self.start_date, end_date, self.cache)
+        if warning:
+            # 古いデータを事前計算済みとして保存しないよう、失敗として扱い後で取り直す
+            raise RuntimeError(warning)
+        if data.empty:
+            raise ValueError(f"{symbol} のデータが取得できませんでした。")
+
+        prepared = prepare(symbol, data)
+        df, inputs, strategy = prepared["df"], prepared["inputs"], None
+        if inputs is not None and llm_available(self.api_key):
+            strategy, _ = generate_strategy(prepared, self.api_key, self.llm_cache)
+
+        self.store.put(symbol, df, self.start_date, end_date, inputs=inputs, strategy=strategy)
+        logger.info("%s を更新しました（%d本, 戦略%s, %.1f秒）", symbol, len(df),
+                    "あり" if strategy else "なし", time.perf_counter() - started)
+
+    def stop(self, *_):
+        self._stopped = True
+
+    def run_once(self):
+        for symbol in self.symbols:
+            try:
+                self.refresh(symbol)
+            except Exception:
+                logger.exception("%s の更新に失敗しました", symbol)
+
+    def run_forever(self):
+        # 起動直後に全銘柄を更新し、その後は銘柄ごとの次回実行時刻まで待つ
+        now = datetime.datetime.now(datetime.timezone.utc)
+        schedule = {symbol: now for symbol in self.symbols}
+        while not self._stopped:
+            now = datetime.datetime.now(datetime.timezone.utc)
+            due = [s for s, at in schedule.items() if at <= now]
+            for symbol in due:
+                try:
+                    self.refresh(symbol)
+                    schedule[symbol] = self.next_run(symbol, datetime.datetime.now(datetime.timezone.utc))
+                except Exception:
+                    logger.exception("%s の更新に失敗しました", symbol)
+                    schedule[symbol] = now + datetime.timedelta(seconds=RETRY_AFTER_ERROR)
+                if self._stopped:
+                    return
+
+            wait = (min(schedule.values()) - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+            # 停止シグナルに素早く反応できるよう最大1秒ずつ待つ
+            end = time.monotonic() + max(wait, 0)
+            while not self._stopped and time.monotonic() < end:
+                time.sleep(min(1.0, end - time.monotonic()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="人気銘柄の事前計算ワーカー")
+    parser.add_argument("--store", default=os.getenv("PRECOMPUTE_DB", "precompute.db"))
+    parser.add_argument("--cache-dir", default=os.getenv("OHLC_CACHE_DIR", ".ohlc_cache"))
+    parser.add_argument("--symbols", default="", help="カンマ区切り（省略時は画面の銘柄一覧）")
+    parser.add_argument("--start", default="2023-01-01", help="取得開始日")
+    parser.add_argument("--fx-interval", type=float, default=15, help="FX の更新間隔（分）")
+    parser.add_argument("--once", action="store_true", help="全銘柄を1回更新して終了する")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    db_path = os.getenv("LLM_CACHE_DB")
+    worker = PrecomputeWorker(
+        store=PrecomputeStore(args.store),
+        cache=OHLCCache(args.cache_dir),
+        symbols=[s.strip() for s in args.symbols.split(",") if s.strip()] or list(SYMBOL_OPTIONS.values()),
+        start_date=datetime.date.fromisoformat(args.start),
+        fx_interval_minutes=args.fx_interval,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        llm_cache=LLMResponseCache(backend=SQLiteResponseCache(db_path) if db_path else None),
+    )
+    if not llm_available(worker.api_key):
+        logger.warning("OPENAI_API_KEY が未設定のため、戦略は生成せず指標のみ事前計算します。")
+
+    if args.once:
+        worker.run_once()
+        return
+
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    LLM 応答キャッシュ・事前計算ストア・履歴ストアに共通する SQLite の土台。
+
+    sqlite3 の接続はスレッドをまたいで使えないので、スレッドごとに1本作って使い回す。
+    WAL モードにして、書き込み中でも読み込みを待たせない。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("PRAGMA journal_mode=WAL")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
@@ -1,8 +1,13 @@
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain
+# LangChain は読み込みが重いので、初めてチェーンを作るときに import する
+from functools import lru_cache
+from instrumentation import token_usage_callback
+import os
+
+@lru_cache(maxsize=None)
+def _strategy_prompt():
+    # プロンプトテンプレートはプロセス内で1度だけ組み立てる
+    from langchain.prompts import ChatPromptTemplate
 
-def load_strategy_chain(api_key: str):
     prompt_template = """
 あなたはプロのテクニカルトレーダーです。
 以下のテクニカル指標に基づいて、{symbol} の今後1週間の戦略を生成してください：
@@ -22,8 +27,41 @@ def load_strategy_chain(api_key: str):
 4. 注意点とアドバイス
 """
 
-    prompt = ChatPromptTemplate.from_template(prompt_template)
+    return ChatPromptTemplate.from_template(prompt_template)
+
+
+def load_strategy_chain(api_key: str, llm=None, max_retries: int = 2):
+    from langchain.chains import LLMChain
+
+    if llm is None:
+        from langchain.chat_models import ChatOpenAI
+
+        llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.5, openai_api_key=api_key, max_retries=max_retries)
+
+    return LLMChain(llm=llm, prompt=_strategy_prompt(), output_key="strategy")
+
+
+@lru_cache(maxsize=None)
+def get_strategy_chain(api_key: str, max_retries: int = 2):
+    # AsyncLLMRunner で使うときは max_retries=0（再試行とその計測はランナー側にまとめる）
+    # チェーンとクライアントはプロセス内で1度だけ構築して使い回す
+    if os.getenv("FAKE_LLM"):
+        from llm_streaming import load_fake_llm
+        chain = load_strategy_chain(api_key, llm=load_fake_llm())
+    else:
+        chain = load_strategy_chain(api_key, max_retries=max_retries)
+    # 呼び出しごとのトークン使用量を計測に記録する
+    chain.llm.callbacks = [token_usage_callback("strategy")]
+    return chain
 
-    llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.5, openai_api_key=api_key)
 
-    return LLMChain(llm=llm, prompt=prompt, output_key="strategy")
+def build_strategy_inputs(symbol: str, latest) -> dict:
+    # 最新行を表示桁に丸めたプロンプト変数へ変換（同じ値ならキャッシュキーも同じになる）
+    return {
+        "symbol": symbol,
+        "macd": f"MACD: {latest['MACD']:.2f}, Signal: {latest['MACD_Signal']:.2f}",
+        "rsi": f"RSI14は{latest['RSI_14']:.1f}",
+        "sma": f"SMA5({latest['SMA_5']:.2f}) vs SMA20({latest['SMA_20']:.2f})",
+        "bb": f"価格({latest['終値']:.2f})はBB範囲 {latest['BB_Lower']:.2f}〜{latest['BB_Upper']:.2f}",
+        "stoch": f"%K: {latest['Stoch_K_14_3']:.1f}, %D: {latest['Stoch_D_14_3']:.1f}"
+    }
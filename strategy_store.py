@@ -0,0 +1,173 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from sqlite_store import SQLiteStore
+
+# trigram は3文字未満の語を検索できないので、短い語は LIKE で探す
+_TRIGRAM_MIN_CHARS = 3
+
+
+class StrategyHistoryStore(SQLiteStore):
+    """
+    保存した分析結果の履歴を SQLite に永続化する。
+
+    WAL モードで読み書きを並行させ、書き込みは専用スレッドに任せて画面を待たせない。
+    一覧はページ単位で取得し、本文は選ばれた1件だけ読む。全文検索は FTS5（trigram）、
+    使えない環境では LIKE で代用する。
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._queue = queue.Queue()
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS strategies ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " name TEXT NOT NULL UNIQUE,"
+            " symbol TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " strategy TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_strategies_symbol ON strategies (symbol, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_strategies_created ON strategies (created_at)")
+        self.fts = self._create_fts(conn)
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name="strategy-history-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _create_fts(conn: sqlite3.Connection) -> bool:
+        # 日本語は分かち書きされないので trigram で部分一致させる
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS strategies_fts USING fts5("
+                " name, symbol, strategy, content='strategies', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            return False
+        conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS strategies_ai AFTER INSERT ON strategies BEGIN
+                INSERT INTO strategies_fts (rowid, name, symbol, strategy)
+                VALUES (new.id, new.name, new.symbol, new.strategy);
+            END;
+            CREATE TRIGGER IF NOT EXISTS strategies_ad AFTER DELETE ON strategies BEGIN
+                INSERT INTO strategies_fts (strategies_fts, rowid, name, symbol, strategy)
+                VALUES ('delete', old.id, old.name, old.symbol, old.strategy);
+            END;
+            CREATE TRIGGER IF NOT EXISTS strategies_au AFTER UPDATE ON strategies BEGIN
+                INSERT INTO strategies_fts (strategies_fts, rowid, name, symbol, strategy)
+                VALUES ('delete', old.id, old.name, old.symbol, old.strategy);
+                INSERT INTO strategies_fts (rowid, name, symbol, strategy)
+                VALUES (new.id, new.name, new.symbol, new.strategy);
+            END;
+            """
+        )
+        return True
+
+    # --- 書き込み（バックグラウンド） ---
+    _UPSERT = (
+        "INSERT INTO strategies (name, symbol, created_at, strategy) VALUES (?, ?, ?, ?)"
+        " ON CONFLICT(name) DO UPDATE SET"
+        " symbol = excluded.symbol, created_at = excluded.created_at, strategy = excluded.strategy"
+    )
+
+    def _write(self, rows: list):
+        conn = None
+        try:
+            conn = self._conn()
+            # 同じ名前は上書き（セッション内の辞書で保存していた頃と同じ挙動）
+            conn.executemany(self._UPSERT, rows)
+            conn.commit()
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+            raise
+
+    def _write_loop(self):
+        while True:
+            # 溜まっている保存要求はまとめて1トランザクションで書く
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write([row for row, _ in batch])
+                for _, future in batch:
+                    future.set_result(None)
+            except sqlite3.OperationalError as e:
+                # ロック待ちのタイムアウトなどは1件ずつ書き直しても同じなので、全件に同じエラーを返す
+                for _, future in batch:
+                    future.set_exception(e)
+            except Exception:
+                # 特定の1件が原因で書けなかったときは1件ずつ書き直し、結果はそれぞれの保存要求に返す。
+                # どんなエラーでもループは止めない（止まると以降の保存が完了しなくなる）
+                for row, future in batch:
+                    try:
+                        self._write([row])
+                        future.set_result(None)
+                    except Exception as e:
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def save(self, name: str, symbol: str, strategy: str) -> Future:
+        """保存を書き込みスレッドに依頼する。戻り値の Future でこの1件の完了と失敗が分かる"""
+        future = Future()
+        self._queue.put(((name, symbol, time.time(), strategy), future))
+        return future
+
+    def flush(self):
+        # すべての書き込み待ちがなくなるまで待つ（ワーカーやスクリプトの終了前に使う）
+        self._queue.join()
+
+    # --- 読み込み ---
+    def _where(self, symbol: Optional[str], query: Optional[str]):
+        clauses, params = [], []
+        if symbol:
+            clauses.append("s.symbol = ?")
+            params.append(symbol)
+        query = (query or "").strip()
+        if query:
+            if self.fts and len(query) >= _TRIGRAM_MIN_CHARS:
+                clauses.append("s.id IN (SELECT rowid FROM strategies_fts WHERE strategies_fts MATCH ?)")
+                params.append('"' + query.replace('"', '""') + '"')
+            else:
+                like = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                clauses.append("(s.name LIKE ? ESCAPE '\\' OR s.symbol LIKE ? ESCAPE '\\' OR s.strategy LIKE ? ESCAPE '\\')")
+                params.extend([like, like, like])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def list(self, page: int = 0, page_size: int = 20, symbol: Optional[str] = None,
+             query: Optional[str] = None) -> tuple:
+        """新しい順に1ページ分の (一覧, 総件数) を返す。一覧に本文は含まない"""
+        where, params = self._where(symbol, query)
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM strategies s{where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT s.id, s.name, s.symbol, s.created_at FROM strategies s{where}"
+            " ORDER BY s.created_at DESC, s.id DESC LIMIT ? OFFSET ?",
+            params + [page_size, page * page_size],
+        ).fetchall()
+        items = [{"id": i, "name": n, "symbol": s, "created_at": c} for i, n, s, c in rows]
+        return items, total
+
+    def get(self, entry_id: int) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT id, name, symbol, created_at, strategy FROM strategies WHERE id = ?", (entry_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "name": row[1], "symbol": row[2], "created_at": row[3], "strategy": row[4]}
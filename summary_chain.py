@@ -1,8 +1,13 @@
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import FewShotPromptTemplate, PromptTemplate
-from langchain.chains import LLMChain
+# LangChain は読み込みが重いので、初めてチェーンを作るときに import する
+from functools import lru_cache
+from instrumentation import token_usage_callback
+import os
+
+@lru_cache(maxsize=None)
+def _summary_prompt():
+    # few-shot の例を含むプロンプトはプロセス内で1度だけ組み立てる
+    from langchain.prompts import FewShotPromptTemplate, PromptTemplate
 
-def load_summary_chain(api_key: str):
     examples = [
         {
             "strategy": """
@@ -66,7 +71,29 @@ def load_summary_chain(api_key: str):
         suffix="戦略: {strategy}\n要約: ",
         input_variables=["strategy"]
     )
+    return prompt
+
+
+def load_summary_chain(api_key: str, llm=None, max_retries: int = 2):
+    from langchain.chains import LLMChain
+
+    if llm is None:
+        from langchain.chat_models import ChatOpenAI
+
+        llm = ChatOpenAI(model_name="gpt-4", temperature=0.2, openai_api_key=api_key, max_retries=max_retries)
+
+    return LLMChain(llm=llm, prompt=_summary_prompt(), output_key="summary")
 
-    llm = ChatOpenAI(model_name="gpt-4", temperature=0.2, openai_api_key=api_key)
 
-    return LLMChain(llm=llm, prompt=prompt, output_key="summary")
+@lru_cache(maxsize=None)
+def get_summary_chain(api_key: str, max_retries: int = 2):
+    # AsyncLLMRunner で使うときは max_retries=0（再試行とその計測はランナー側にまとめる）
+    # few-shot プロンプトとクライアントはプロセス内で1度だけ構築して使い回す
+    if os.getenv("FAKE_LLM"):
+        from llm_streaming import load_fake_llm, FAKE_SUMMARY
+        chain = load_summary_chain(api_key, llm=load_fake_llm([FAKE_SUMMARY]))
+    else:
+        chain = load_summary_chain(api_key, max_retries=max_retries)
+    # 呼び出しごとのトークン使用量を計測に記録する
+    chain.llm.callbacks = [token_usage_callback("summary")]
+    return chain
@@ -0,0 +1,18 @@
+# 画面と一括分析で共通に使う銘柄一覧
+SYMBOL_OPTIONS = {
+    "S&P500（米国）": "^GSPC",
+    "日経平均（日本）": "^N225",
+    "NASDAQ100（米国）": "^NDX",
+    "USD/JPY（ドル円）": "JPY=X",
+    "EUR/USD（ユーロドル）": "EURUSD=X"
+}
+
+
+def parse_symbols(text: str) -> list:
+    # カンマ・空白・改行区切りの銘柄コードを重複なしで順序を保って返す
+    symbols = []
+    for token in text.replace(",", " ").split():
+        token = token.strip().upper()
+        if token and token not in symbols:
+            symbols.append(token)
+    return symbols
@@ -0,0 +1,69 @@
+"""
+AsyncLLMRunner をダミーの OpenAI 互換サーバー（mock_llm_server.py）に向けて動かす。
+
+ChatOpenAI を実際に使い、並行実行・同時実行数の上限・429 の再試行を確認する。
+"""
+import asyncio
+import random
+import time
+
+import pytest
+
+from async_llm import AsyncLLMRunner
+from mock_llm_server import start_mock_server
+from strategy_chain import load_strategy_chain
+
+VARIABLES = {"symbol": "^N225", "macd": "MACD: 1.00, Signal: 0.50", "rsi": "RSI14は55.0",
+             "sma": "SMA5(100.00) vs SMA20(99.00)", "bb": "価格(100.00)はBB範囲 95.00〜105.00",
+             "stoch": "%K: 60.0, %D: 55.0"}
+
+
+@pytest.fixture(autouse=True)
+def no_fake_llm(monkeypatch):
+    monkeypatch.delenv("FAKE_LLM", raising=False)
+
+
+async def run_against_mock(monkeypatch, symbols: int, runner: AsyncLLMRunner, **server_options):
+    server, base_url = await start_mock_server(**server_options)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    try:
+        # 再試行はランナー側だけで行う（クライアント内部の再試行は無効にする）
+        chain = load_strategy_chain("dummy", max_retries=0)
+        inputs = {f"S{i}": dict(VARIABLES, symbol=f"S{i}") for i in range(symbols)}
+        started = time.perf_counter()
+        results = await runner.generate(inputs, chain)
+        return results, time.perf_counter() - started, dict(server.app["stats"])
+    finally:
+        await server.cleanup()
+
+
+def test_wall_time_close_to_slowest_call(monkeypatch):
+    runner = AsyncLLMRunner(concurrency=8, rate_per_sec=100, burst=100)
+    results, wall, _ = asyncio.run(run_against_mock(monkeypatch, 8, runner, latency=0.3, jitter=0.2))
+
+    assert all(r["error"] is None and r["strategy"] for r in results.values())
+    slowest = max(m["latency_s"] for m in runner.metrics)
+    # 直列なら 8 回分（2.4 秒以上）かかる
+    assert wall < slowest + 0.3
+
+
+def test_in_flight_never_exceeds_concurrency(monkeypatch):
+    runner = AsyncLLMRunner(concurrency=3, rate_per_sec=100, burst=100)
+    results, _, stats = asyncio.run(run_against_mock(monkeypatch, 9, runner, latency=0.1))
+
+    assert all(r["error"] is None for r in results.values())
+    assert stats["requests"] == 9
+    assert stats["max_in_flight"] == 3
+
+
+def test_rate_limited_calls_are_retried(monkeypatch):
+    random.seed(1)
+    runner = AsyncLLMRunner(concurrency=4, rate_per_sec=100, burst=100, retries=6, backoff_base=0.01)
+    results, _, stats = asyncio.run(run_against_mock(monkeypatch, 12, runner, latency=0.01, failure_rate=0.3))
+
+    assert stats["failures"] > 0
+    assert all(r["error"] is None for r in results.values())
+    summary = runner.latency_summary()["strategy"]
+    # 429 はすべてランナーの再試行として数えられ、クライアント内部では再試行されていない
+    assert summary["retries"] == stats["failures"]
+    assert stats["requests"] == 12 + stats["failures"]